@@ -0,0 +1,61 @@
+import os
+
+
+class AccountIndex:
+    """
+    Index of system accounts parsed from a passwd file.
+
+    The file is re-read only when its mtime, inode or size changes (useradd
+    and userdel replace it), so lookups are dictionary hits instead of a
+    linear scan of the whole file.
+    """
+
+    def __init__(self, path="/etc/passwd"):
+        self.path = path
+        self._signature = None
+        self._accounts = {}
+
+    def _refresh(self):
+        st = os.stat(self.path)
+        signature = (st.st_mtime_ns, st.st_ino, st.st_size)
+        if signature == self._signature:
+            return
+        accounts = {}
+        with open(self.path, "r") as f:
+            for line in f:
+                fields = line.rstrip("\n").split(":")
+                if len(fields) < 7 or not fields[2].isdigit():
+                    continue
+                accounts[fields[0]] = (int(fields[2]), fields[5])
+        self._accounts = accounts
+        self._signature = signature
+
+    def get(self, username):
+        """
+        Return ``(uid, home)`` for an account, or None if it does not exist.
+        """
+        self._refresh()
+        return self._accounts.get(username)
+
+    def exists(self, username):
+        self._refresh()
+        return username in self._accounts
+
+    def exists_many(self, usernames):
+        """
+        Return the subset of ``usernames`` that exist, with one freshness
+        check for the whole batch.
+        """
+        self._refresh()
+        return {username for username in usernames if username in self._accounts}
+
+    def in_uid_range(self, uid_min, uid_max):
+        """
+        Return ``{username: uid}`` for accounts with ``uid_min <= uid <= uid_max``.
+        """
+        self._refresh()
+        return {
+            username: uid
+            for username, (uid, _) in self._accounts.items()
+            if uid_min <= uid <= uid_max
+        }
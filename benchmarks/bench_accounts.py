@@ -0,0 +1,66 @@
+"""
+System account lookups: rereading passwd on every call vs. AccountIndex.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_accounts [--lines 50000] [--lookups 1000]
+
+Simulates `/sync_db` checking ``--lookups`` rentals against a passwd file
+with ``--lines`` accounts.
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from accounts import AccountIndex
+
+
+def write_passwd(path, lines):
+    with open(path, "w") as f:
+        for i in range(lines):
+            f.write(f"user{i}:x:{1000 + i}:{1000 + i}::/home/user{i}:/bin/bash\n")
+
+
+def legacy_exists(path, username):
+    with open(path, "r") as f:
+        lines = f.readlines()
+    return any(line.startswith(username + ":") for line in lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--lines", type=int, default=50000)
+    parser.add_argument("--lookups", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "passwd")
+        write_passwd(path, args.lines)
+        usernames = [
+            f"user{random.randrange(args.lines * 2)}" for _ in range(args.lookups)
+        ]
+
+        start = time.perf_counter()
+        expected = {name for name in usernames if legacy_exists(path, name)}
+        legacy = time.perf_counter() - start
+
+        index = AccountIndex(path)
+        start = time.perf_counter()
+        found = {name for name in usernames if index.exists(name)}
+        indexed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batch = index.exists_many(usernames)
+        batched = time.perf_counter() - start
+
+    assert expected == found == batch
+    print(f"{'reread':>12}: {legacy * 1000:9.1f} ms")
+    print(f"{'index':>12}: {indexed * 1000:9.1f} ms (includes the initial parse)")
+    print(f"{'exists_many':>12}: {batched * 1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
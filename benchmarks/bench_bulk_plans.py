@@ -0,0 +1,116 @@
+"""
+`/extend_plan all`: per-user helper loop vs. the set-based bulk path.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_bulk_plans [--rentals 5000]
+
+The per-user mode replays the statements the old loop issued for every
+rental (a lookup, two subquery-keyed UPDATEs and two commits); the bulk mode
+runs plans.shift_all_rentals in one transaction.
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from database import Database
+from plans import shift_all_rentals
+
+DAY = 24 * 60 * 60
+
+
+def seed(db, rentals):
+    now = int(time.time())
+
+    def _seed(cursor):
+        cursor.executescript(
+            """
+            CREATE TABLE users (
+                user_id INTEGER PRIMARY KEY, linux_username TEXT UNIQUE NOT NULL
+            );
+            CREATE TABLE telegram_users (
+                tg_user_id INTEGER PRIMARY KEY, user_id INTEGER, tg_first_name TEXT
+            );
+            CREATE TABLE rentals (
+                rental_id INTEGER PRIMARY KEY, user_id INTEGER, telegram_id INTEGER,
+                end_time INTEGER, is_expired INTEGER DEFAULT 0,
+                is_active INTEGER DEFAULT 1,
+                sent_expiry_notification INTEGER DEFAULT 0
+            );
+            CREATE INDEX idx_rentals_user_id ON rentals(user_id);
+            """
+        )
+        cursor.executemany(
+            "INSERT INTO users VALUES (?, ?)",
+            ((i, f"user{i}") for i in range(rentals)),
+        )
+        cursor.executemany(
+            "INSERT INTO telegram_users VALUES (?, ?, ?)",
+            ((1000 + i, i, f"User {i}") for i in range(rentals)),
+        )
+        cursor.executemany(
+            "INSERT INTO rentals (user_id, telegram_id, end_time) VALUES (?, ?, ?)",
+            ((i, 1000 + i, now + (i % 30) * DAY) for i in range(rentals)),
+        )
+
+    return _seed
+
+
+def per_user(cursor, seconds):
+    usernames = cursor.execute(
+        """SELECT u.linux_username, r.is_active FROM rentals r
+        JOIN users u ON r.user_id = u.user_id"""
+    ).fetchall()
+    conn = cursor.connection
+    for username, is_active in usernames:
+        if not is_active:
+            continue
+        (end_time,) = cursor.execute(
+            """SELECT end_time FROM rentals WHERE user_id = (
+            SELECT user_id FROM users WHERE linux_username=?)""",
+            (username,),
+        ).fetchone()
+        cursor.execute(
+            """UPDATE rentals SET end_time=? WHERE user_id = (
+            SELECT user_id FROM users WHERE linux_username=?)""",
+            (end_time + seconds, username),
+        )
+        conn.commit()
+        cursor.execute(
+            """UPDATE rentals SET sent_expiry_notification = 0, is_expired = 0
+            WHERE user_id = (SELECT user_id FROM users WHERE linux_username = ?)""",
+            (username,),
+        )
+        conn.commit()
+    return len(usernames)
+
+
+async def run(mode, rentals):
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "bench.db"))
+        await db.transaction(seed(db, rentals))
+        start = time.perf_counter()
+        if mode == "per-user":
+            await db.transaction(per_user, 5 * DAY)
+        else:
+            await db.transaction(shift_all_rentals, 5 * DAY, int(time.time()))
+        elapsed = time.perf_counter() - start
+        db.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rentals", type=int, default=5000)
+    args = parser.parse_args()
+
+    for mode in ("per-user", "bulk"):
+        elapsed = asyncio.run(run(mode, args.rentals))
+        print(f"{mode:>8}: {elapsed * 1000:9.1f} ms for {args.rentals} rentals")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Mixed read/write throughput: legacy single cursor vs. the Database layer.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_db [--rentals 5000] [--ops 2000]
+
+The legacy mode reproduces the old setup (rollback journal, one shared
+cursor used directly on the event loop). Besides throughput, both modes
+report the longest event loop stall seen by a 1ms ticker, which is what
+delays unrelated updates such as /start.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from database import Database
+
+LIST_QUERY = """
+    SELECT u.linux_username, r.end_time, r.plan_duration, r.is_expired
+    FROM rentals r
+    LEFT JOIN users u ON r.user_id = u.user_id
+"""
+WRITE_QUERY = "UPDATE rentals SET end_time = end_time + 60 WHERE rental_id = ?"
+
+
+def seed(path, rentals):
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        CREATE TABLE users (user_id INTEGER PRIMARY KEY, linux_username TEXT);
+        CREATE TABLE rentals (
+            rental_id INTEGER PRIMARY KEY, user_id INTEGER, end_time INTEGER,
+            plan_duration INTEGER, is_expired INTEGER DEFAULT 0
+        );
+        """
+    )
+    now = int(time.time())
+    conn.executemany(
+        "INSERT INTO users VALUES (?, ?)", ((i, f"user{i}") for i in range(rentals))
+    )
+    conn.executemany(
+        "INSERT INTO rentals VALUES (?, ?, ?, ?, 0)",
+        ((i, i, now + i * 60, 86400) for i in range(rentals)),
+    )
+    conn.commit()
+    conn.close()
+
+
+async def ticker(stop, stalls):
+    last = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(0.001)
+        now = time.perf_counter()
+        stalls.append(now - last)
+        last = now
+
+
+async def run(mode, path, rentals, ops, concurrency):
+    if mode == "legacy":
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA journal_mode = DELETE")
+        cursor = conn.cursor()
+
+        async def read():
+            cursor.execute(LIST_QUERY)
+            cursor.fetchall()
+
+        async def write(rental_id):
+            cursor.execute(WRITE_QUERY, (rental_id,))
+            conn.commit()
+
+    else:
+        db = Database(path)
+
+        async def read():
+            await db.fetchall(LIST_QUERY, reader=True)
+
+        async def write(rental_id):
+            await db.execute(WRITE_QUERY, (rental_id,))
+
+    queue = asyncio.Queue()
+    for _ in range(ops):
+        queue.put_nowait(random.random() < 0.2)
+
+    async def worker():
+        while not queue.empty():
+            is_write = queue.get_nowait()
+            if is_write:
+                await write(random.randrange(rentals))
+            else:
+                await read()
+            await asyncio.sleep(0)
+
+    stop, stalls = asyncio.Event(), []
+    tick = asyncio.create_task(ticker(stop, stalls))
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await tick
+
+    if mode == "legacy":
+        conn.close()
+    else:
+        db.close()
+    return ops / elapsed, max(stalls) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rentals", type=int, default=5000)
+    parser.add_argument("--ops", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    for mode in ("legacy", "database"):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.db")
+            seed(path, args.rentals)
+            throughput, stall = asyncio.run(
+                run(mode, path, args.rentals, args.ops, args.concurrency)
+            )
+        print(f"{mode:>9}: {throughput:8.1f} ops/s, max loop stall {stall:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+`/earnings`: trigger-maintained summaries vs. a full scan of payments.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_earnings [--payments 1000000] [--days 1095] [--repeat 20]
+
+Loads ``--payments`` payments spread over ``--days`` days into two
+databases, one with the summary triggers and one without, to show what the
+triggers cost on insert. Each period is then answered from the summaries
+and by scanning payments (the table has no index on payment_date, like the
+bot's), and the two totals are checked against each other.
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from earnings import SUMMARY_TABLES, earnings_between, trigger_statements
+
+OFFSET = 330  # Asia/Kolkata
+ZONE = timezone(timedelta(minutes=OFFSET))
+
+SCHEMA = """
+CREATE TABLE payments (
+    payment_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    amount REAL NOT NULL,
+    currency TEXT NOT NULL,
+    payment_date INTEGER NOT NULL
+);
+CREATE INDEX idx_payments_user_date ON payments(user_id, payment_date);
+CREATE INDEX idx_payments_user_currency ON payments(user_id, currency, amount);
+"""
+
+SCAN_QUERY = """
+    SELECT COALESCE(SUM(amount), 0), COUNT(*) FROM payments
+    WHERE payment_date >= ? AND payment_date < ?
+    """
+
+
+def make_payments(count, days, today):
+    rng = random.Random(42)
+    first = datetime(today.year, today.month, today.day, tzinfo=ZONE) - timedelta(days=days - 1)
+    span = days * 86400
+    for _ in range(count):
+        amount = rng.randrange(100, 5000)
+        yield (
+            rng.randrange(1, 10001),
+            -amount if rng.random() < 0.05 else amount,
+            "INR",
+            int(first.timestamp()) + rng.randrange(span),
+        )
+
+
+def load(path, payments, days, today, triggers):
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    if triggers:
+        for statement in SUMMARY_TABLES + tuple(trigger_statements(OFFSET)):
+            conn.execute(statement)
+    start = time.perf_counter()
+    conn.executemany(
+        "INSERT INTO payments (user_id, amount, currency, payment_date) VALUES (?, ?, ?, ?)",
+        make_payments(payments, days, today),
+    )
+    conn.commit()
+    return conn, time.perf_counter() - start
+
+
+def timed(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--payments", type=int, default=1000000)
+    parser.add_argument("--days", type=int, default=3 * 365)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    today = datetime.now(ZONE).date()
+    periods = {
+        "today": (today, today),
+        "month": (today.replace(day=1), today),
+        "year": (today.replace(month=1, day=1), today),
+        "range": (today - timedelta(days=400), today - timedelta(days=35)),
+        "all": (today - timedelta(days=args.days), today),
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        plain, plain_load = load(
+            os.path.join(tmp, "plain.db"), args.payments, args.days, today, False
+        )
+        summary, summary_load = load(
+            os.path.join(tmp, "summary.db"), args.payments, args.days, today, True
+        )
+        print(
+            f"load {args.payments} payments: {plain_load:.2f} s plain, "
+            f"{summary_load:.2f} s with triggers"
+        )
+
+        for name, (start, end) in periods.items():
+            lower = int(datetime(start.year, start.month, start.day, tzinfo=ZONE).timestamp())
+            upper = int(datetime(end.year, end.month, end.day, tzinfo=ZONE).timestamp()) + 86400
+            scanned, scan_time = timed(
+                lambda: plain.execute(SCAN_QUERY, (lower, upper)).fetchone(), args.repeat
+            )
+            earnings, summary_time = timed(
+                lambda: earnings_between(summary.cursor(), start, end), args.repeat
+            )
+            correct = (
+                abs(earnings.total - scanned[0]) < 0.01 and earnings.payments == scanned[1]
+            )
+            print(
+                f"{name:>6}: scan {scan_time * 1000:8.2f} ms, "
+                f"summary {summary_time * 1000:6.3f} ms, "
+                f"{scanned[1]:8d} payments, totals {'match' if correct else 'DIFFER'}"
+            )
+        plain.close()
+        summary.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Drive the broadcast fan-out engine against a fake Telegram client.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_fanout [--recipients 500]
+
+The fake client adds random latency, raises a FloodWait-style error on a
+fraction of sends, reports some chats as blocked and fails others
+transiently. The script reports how long the broadcast took and the peak
+send rate; tests/test_fanout.py covers the behaviour.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from fanout import FanOut
+
+
+class FakeFloodWait(Exception):
+    def __init__(self, seconds):
+        super().__init__(f"flood wait {seconds}s")
+        self.seconds = seconds
+
+
+class FakeBlocked(Exception):
+    pass
+
+
+class FakeClient:
+    def __init__(self, latency, flood_rate, blocked, flaky_rate):
+        self.latency = latency
+        self.flood_rate = flood_rate
+        self.blocked = blocked
+        self.flaky_rate = flaky_rate
+        self.delivered = set()
+        self.timestamps = []
+
+    async def send_message(self, chat_id, message):
+        self.timestamps.append(time.monotonic())
+        await asyncio.sleep(random.uniform(0, self.latency))
+        if chat_id in self.blocked:
+            raise FakeBlocked(chat_id)
+        if random.random() < self.flood_rate:
+            raise FakeFloodWait(1)
+        if random.random() < self.flaky_rate:
+            raise ConnectionError("transient")
+        self.delivered.add(chat_id)
+
+
+def peak_rate(timestamps, window=1.0):
+    timestamps = sorted(timestamps)
+    peak, start = 0, 0
+    for end, stamp in enumerate(timestamps):
+        while stamp - timestamps[start] > window:
+            start += 1
+        peak = max(peak, end - start + 1)
+    return peak
+
+
+async def run(args):
+    recipients = list(range(args.recipients))
+    blocked = set(random.sample(recipients, args.recipients // 20))
+    client = FakeClient(args.latency, args.flood_rate, blocked, args.flaky_rate)
+    fanout = FanOut(
+        lambda chat_id: client.send_message(chat_id, "hello"),
+        rate=args.rate,
+        backoff=0.05,
+        flood_errors=(FakeFloodWait,),
+        blocked_errors=(FakeBlocked,),
+    )
+
+    async def progress(result):
+        print(f"  progress: {result.done}/{result.total}")
+
+    start = time.perf_counter()
+    result = await fanout.run(recipients, on_progress=progress, progress_interval=2)
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"sent={result.sent} failed={result.failed} blocked={result.blocked} "
+        f"in {elapsed:.1f}s, peak {peak_rate(client.timestamps)} sends/s "
+        f"(limit {args.rate}/s + burst)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--recipients", type=int, default=500)
+    parser.add_argument("--rate", type=float, default=25)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--flood-rate", type=float, default=0.01)
+    parser.add_argument("--flaky-rate", type=float, default=0.05)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Date formatting: per-call zone lookup vs. the cached zone, memoized strings and batch API.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_formatting [--count 100000] [--distinct 5000]
+
+Formats ``--count`` epochs drawn from ``--distinct`` values spread over a
+year, the way report and listing columns repeat the same creation and
+expiry times. ``legacy`` is the old ``get_date_str``, which resolved the
+time zone and called strftime for every timestamp.
+"""
+
+import argparse
+import os
+import random
+import time
+from datetime import datetime
+
+# timeutils imports constants, which refuses to load without the bot settings.
+for name in ("API_ID", "API_HASH", "BOT_TOKEN", "ADMIN_ID", "GROUP_ID"):
+    os.environ.setdefault(name, "1")
+os.environ.setdefault("SSH_PORT", "22")
+os.environ.setdefault("SSH_HOSTNAME", "localhost")
+
+import pytz  # noqa: E402
+
+import timeutils  # noqa: E402
+from constants import TIME_ZONE  # noqa: E402
+
+NOW = 1_700_000_000
+
+
+def legacy_get_date_str(epoch):
+    ist = pytz.timezone(TIME_ZONE)
+    date = datetime.fromtimestamp(epoch, ist)
+    day_suffix = timeutils.get_day_suffix(date.day)
+    day = date.day
+    return date.strftime(f"{day}{day_suffix} %B %Y, %I:%M %p IST")
+
+
+def run(func, epochs):
+    timeutils._format_minute.cache_clear()
+    start = time.perf_counter()
+    result = func(epochs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=100000)
+    parser.add_argument("--distinct", type=int, default=5000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    values = [NOW + rng.randrange(365 * 86400) for _ in range(args.distinct)]
+    epochs = [rng.choice(values) for _ in range(args.count)]
+
+    expected, _ = run(lambda column: [legacy_get_date_str(e) for e in column], epochs)
+    cases = (
+        ("legacy", lambda column: [legacy_get_date_str(e) for e in column]),
+        ("get_date_str", lambda column: [timeutils.get_date_str(e) for e in column]),
+        ("format_dates", timeutils.format_dates),
+    )
+    for name, func in cases:
+        result, elapsed = run(func, epochs)
+        print(
+            f"{name:>12}: {elapsed * 1000:8.1f} ms, "
+            f"{elapsed / len(epochs) * 1e6:6.2f} us/timestamp, "
+            f"{'matches' if result == expected else 'MISMATCH'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Password rotation: two forks per user vs. in-process hashing + one batch.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_passwords [--users 200]
+
+The per-user mode forks ``openssl passwd -6`` and then a stand-in for
+``sudo usermod`` (``true``) for every user, as change_password used to. The
+batched mode hashes with shacrypt in-process and feeds all pairs to a single
+stand-in for ``sudo chpasswd -e`` (``cat``). No system accounts are touched.
+"""
+
+import argparse
+import asyncio
+import time
+
+from provisioning import Provisioner, SubprocessRunner
+
+STAND_INS = {"usermod": ["true"], "chpasswd": ["cat"]}
+
+
+class StandInRunner(SubprocessRunner):
+    async def run(self, args, input=None, timeout=None):
+        if args[0] == "sudo":
+            args = STAND_INS[args[1]]
+        return await super().run(args, input=input, timeout=timeout)
+
+
+async def per_user(provisioner, usernames):
+    for username in usernames:
+        result = await provisioner.run(
+            ["openssl", "passwd", "-6", "secret"], check=True
+        )
+        await provisioner.run(
+            ["sudo", "usermod", "-p", result.stdout.strip(), username], check=True
+        )
+
+
+async def batched(provisioner, usernames):
+    hashes = await provisioner.hash_passwords(
+        {username: "secret" for username in usernames}
+    )
+    await provisioner.set_password_hashes(hashes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=200)
+    args = parser.parse_args()
+    usernames = [f"user{i}" for i in range(args.users)]
+
+    for name, rotate in (("per-user", per_user), ("batched", batched)):
+        provisioner = Provisioner(StandInRunner())
+        start = time.perf_counter()
+        asyncio.run(rotate(provisioner, usernames))
+        elapsed = time.perf_counter() - start
+        print(f"{name:>8}: {elapsed * 1000:8.1f} ms for {args.users} users")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+`/gen_report` formats: render time and peak memory per format and size.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_report_formats [--sizes 1000 10000 100000] [--weasyprint-limit 10000]
+
+The PDF and HTML renderers get a list of rows, as they do in the worker
+process; the CSV renderer is fed a generator, as it is from the database
+cursor. Peak memory is the tracemalloc peak during rendering (the row list
+itself, shown separately, is what streaming avoids), measured in a second
+run because tracemalloc slows rendering down. WeasyPrint takes
+minutes above ``--weasyprint-limit`` rows, so larger sizes are skipped; a
+renderer whose library cannot be loaded is reported as unavailable.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+# reports imports constants, which refuses to load without the bot settings.
+for name in ("API_ID", "API_HASH", "BOT_TOKEN", "ADMIN_ID", "GROUP_ID"):
+    os.environ.setdefault(name, "1")
+os.environ.setdefault("SSH_PORT", "22")
+os.environ.setdefault("SSH_HOSTNAME", "localhost")
+
+from reports import REPORT_FORMATS  # noqa: E402
+
+NOW = 1_700_000_000
+
+
+def make_rows(count):
+    for i in range(count):
+        yield (
+            i + 1,
+            f"user{i}",
+            NOW - i * 60,
+            NOW + (i % 90) * 86400,
+            i % 5 == 0,
+            float(i % 1000),
+            "INR" if i % 4 else "USD",
+            i % 20,
+        )
+
+
+def peak_memory(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure(func):
+    """
+    Return ``(seconds, peak_bytes)``. tracemalloc slows rendering down
+    several times, so time and memory come from separate runs.
+    """
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    return elapsed, peak_memory(func)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--weasyprint-limit", type=int, default=10000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            rows = []
+            list_peak = peak_memory(lambda: rows.extend(make_rows(size)))
+            print(f"{size} rows (row list: {list_peak / 2**20:.1f} MiB)")
+
+            for name, report_format in REPORT_FORMATS.items():
+                if name == "pdf" and size > args.weasyprint_limit:
+                    print(f"{name:>8}: skipped (over --weasyprint-limit)")
+                    continue
+                path = os.path.join(tmp, f"{name}-{size}-{report_format.filename}")
+
+                def render():
+                    source = make_rows(size) if report_format.streamed else rows
+                    report_format.render(source, path)
+
+                try:
+                    elapsed, peak = measure(render)
+                except (ImportError, OSError) as e:
+                    print(f"{name:>8}: unavailable ({e.__class__.__name__}: {e})")
+                    continue
+                print(
+                    f"{name:>8}: {elapsed * 1000:9.1f} ms, peak {peak / 2**20:7.1f} MiB, "
+                    f"file {os.path.getsize(path) / 2**20:6.1f} MiB"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+`/gen_report` query: the old rentals x payments join vs. the aggregated one.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_report_query [--users 10000] [--payments 1000000] [--rentals 3]
+
+Seeds a database with the bot's schema and indexes, where every user has
+``--rentals`` rentals, and checks each query's totals against a direct sum
+over the payments table.
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from report_queries import PAYMENTS_REPORT_QUERY
+
+LEGACY_QUERY = """
+    SELECT
+        u.user_id,
+        u.linux_username AS username,
+        u.creation_time,
+        r.end_time AS expiry_time,
+        r.is_expired,
+        COALESCE(SUM(p.amount), 0) AS total_payment,
+        p.currency,
+        COUNT(p.payment_id) AS payment_count
+    FROM users u
+    LEFT JOIN rentals r ON u.user_id = r.user_id
+    LEFT JOIN payments p ON u.user_id = p.user_id
+    GROUP BY u.user_id, u.linux_username, u.creation_time, r.end_time, r.is_expired, p.currency
+"""
+
+SCHEMA = """
+CREATE TABLE users (
+    user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    uuid TEXT UNIQUE DEFAULT NULL,
+    linux_username TEXT UNIQUE NOT NULL,
+    linux_password TEXT NOT NULL,
+    creation_time INTEGER DEFAULT (strftime('%s', 'now'))
+);
+CREATE TABLE rentals (
+    rental_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    telegram_id INTEGER DEFAULT NULL,
+    start_time INTEGER NOT NULL,
+    end_time INTEGER NOT NULL,
+    plan_duration INTEGER NOT NULL,
+    amount REAL NOT NULL,
+    currency TEXT NOT NULL,
+    is_expired INTEGER DEFAULT 0,
+    is_active INTEGER DEFAULT 1,
+    sent_expiry_notification INTEGER DEFAULT 0
+);
+CREATE TABLE payments (
+    payment_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    amount REAL NOT NULL,
+    currency TEXT NOT NULL,
+    payment_date INTEGER NOT NULL
+);
+CREATE INDEX idx_rentals_user_id ON rentals(user_id);
+CREATE INDEX idx_payments_user_date ON payments(user_id, payment_date);
+CREATE INDEX idx_payments_user_currency ON payments(user_id, currency, amount);
+"""
+
+
+def seed(conn, users, payments, rentals):
+    rng = random.Random(42)
+    conn.executescript(SCHEMA)
+    conn.executemany(
+        "INSERT INTO users (user_id, linux_username, linux_password) VALUES (?, ?, ?)",
+        ((i, f"user{i}", "secret") for i in range(1, users + 1)),
+    )
+    conn.executemany(
+        """INSERT INTO rentals (user_id, start_time, end_time, plan_duration, amount, currency)
+        VALUES (?, 0, ?, 0, 0, 'INR')""",
+        ((i % users + 1, i) for i in range(users * rentals)),
+    )
+    conn.executemany(
+        "INSERT INTO payments (user_id, amount, currency, payment_date) VALUES (?, ?, ?, ?)",
+        (
+            (
+                rng.randrange(1, users + 1),
+                rng.randrange(1, 1000),
+                "INR" if rng.random() < 0.8 else "USD",
+                i,
+            )
+            for i in range(payments)
+        ),
+    )
+    conn.commit()
+
+
+def totals(rows):
+    result = {}
+    for user_id, _, _, _, _, total, currency, _ in rows:
+        if currency is not None:
+            result[user_id, currency] = result.get((user_id, currency), 0) + total
+    return result
+
+
+def run(conn, query):
+    start = time.perf_counter()
+    rows = conn.execute(query).fetchall()
+    return rows, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--payments", type=int, default=1000000)
+    parser.add_argument("--rentals", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, "report.db"))
+        seed(conn, args.users, args.payments, args.rentals)
+        expected = {
+            (user_id, currency): total
+            for user_id, currency, total in conn.execute(
+                "SELECT user_id, currency, SUM(amount) FROM payments GROUP BY user_id, currency"
+            )
+        }
+
+        for name, query in (("legacy", LEGACY_QUERY), ("aggregated", PAYMENTS_REPORT_QUERY)):
+            rows, elapsed = run(conn, query)
+            correct = totals(rows) == expected
+            print(
+                f"{name:>10}: {elapsed * 1000:9.1f} ms, {len(rows):7d} rows, "
+                f"totals {'correct' if correct else 'WRONG'}"
+            )
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
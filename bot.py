@@ -0,0 +1,1991 @@
+import asyncio
+import csv
+import io
+import multiprocessing
+import os
+import random
+import re
+import string
+import subprocess
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+from telethon import Button, TelegramClient, events
+from telethon.errors import (
+    FloodWaitError,
+    InputUserDeactivatedError,
+    MessageNotModifiedError,
+    PeerIdInvalidError,
+    UserIsBlockedError,
+)
+
+from constants import (
+    ADJECTIVES,
+    ADMIN_ID,
+    API_HASH,
+    API_ID,
+    BE_NOTED_TEXT,
+    BOT_TOKEN,
+    EXCHANGE_RATE_TTL,
+    EXCHANGE_RATE_URL,
+    GROUP_ID,
+    NOUNS,
+    PASSWD_PATH,
+    RENTAL_UID_MAX,
+    REPORT_CACHE_DIR,
+    REPORT_CACHE_MAX_MB,
+    REPORT_WORKERS,
+    RENTAL_UID_MIN,
+    SSH_HOSTNAME,
+    SSH_PORT,
+    SYNC_APPLY,
+    SYNC_IGNORE_USERS,
+    SYNC_INTERVAL,
+    UTMP_PATH,
+    WHO_CACHE_TTL,
+)
+from accounts import AccountIndex
+from database import Database
+from earnings import (
+    ALL_TIME_QUERY,
+    DAY_RANGE_QUERY,
+    SUMMARY_TABLES,
+    earnings_between,
+    needs_backfill,
+    trigger_statements,
+)
+from earnings import rebuild as rebuild_earnings_summary
+from ledger import (
+    BALANCE_QUERY,
+    BALANCES_TABLE,
+    fetch_history_page,
+    history_button_data,
+    history_query,
+    parse_history_button_data,
+    write_history_csv,
+)
+from ledger import migrate as migrate_ledger
+from ledger import trigger_statements as ledger_trigger_statements
+from exchange import ExchangeRates, ExchangeRateUnavailable
+from fanout import FanOut
+from listing import FILTER_CODES, FILTERS, SORT_CODES, SORTS, ListView, fetch_page
+from onboarding import insert_tenants, parse_tenant_file
+from outbox import Outbox
+from plans import (
+    EXPIRED_RENTALS_QUERY,
+    EXPIRING_RENTALS_QUERY,
+    MAX_IN_PARAMS,
+    claim_expiry_notifications,
+    shift_all_rentals,
+)
+from provisioning import Provisioner, ProvisioningError
+from reconcile import Reconciler
+from report_cache import ReportCache
+from report_queries import PAYMENTS_REPORT_QUERY
+from reports import DEFAULT_REPORT_FORMAT, REPORT_FORMATS
+from scheduler import WARNING_WINDOW, ExpiryScheduler
+from sessions import SessionMonitor
+from timeutils import (
+    format_dates,
+    format_time_delta,
+    get_date_str,
+    local_today,
+    utc_offset_minutes,
+)
+from user_cache import UserKeyCache
+
+client = TelegramClient("server_plan_bot", API_ID, API_HASH).start(bot_token=BOT_TOKEN)
+
+# --- Database Setup ---
+db = Database("server_plan.db")
+expiry_scheduler = ExpiryScheduler()
+user_keys = UserKeyCache(db)
+account_index = AccountIndex(PASSWD_PATH)
+session_monitor = SessionMonitor(db, UTMP_PATH, ttl=WHO_CACHE_TTL)
+provisioner = Provisioner()
+exchange_rates = ExchangeRates(db, EXCHANGE_RATE_URL, ttl=EXCHANGE_RATE_TTL)
+outbox = Outbox(client.send_message, ADMIN_ID, flood_errors=(FloodWaitError,))
+# Report rendering workers. They are started by a forkserver rather than
+# forked from this process, which already runs the database threads; the
+# renderers live in reports.py, so the workers never import this module.
+report_context = multiprocessing.get_context("forkserver")
+report_context.set_forkserver_preload(["reports"])
+report_pool = ProcessPoolExecutor(max_workers=REPORT_WORKERS, mp_context=report_context)
+REPORT_PROGRESS_INTERVAL = 5
+report_cache = ReportCache(REPORT_CACHE_DIR, max_bytes=REPORT_CACHE_MAX_MB * 1024 * 1024)
+
+
+def create_table(table_name, schema):
+    db.execute_sync(f"CREATE TABLE IF NOT EXISTS {table_name} ({schema})")
+
+
+# Table for active subscription users
+create_table(
+    "users",
+    """
+     user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    uuid TEXT UNIQUE DEFAULT NULL,
+    linux_username TEXT UNIQUE NOT NULL,
+    linux_password TEXT NOT NULL,
+    creation_time INTEGER DEFAULT (strftime('%s', 'now'))
+    """,
+)
+
+create_table(
+    "telegram_users",
+    """
+    tg_user_id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    tg_username TEXT DEFAULT NULL,
+    tg_first_name TEXT DEFAULT NULL,
+    tg_last_name TEXT DEFAULT NULL,
+    FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+    """,
+)
+
+# Table for server rental plan details
+create_table(
+    "rentals",
+    """
+    rental_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    telegram_id INTEGER DEFAULT NULL,
+    start_time INTEGER NOT NULL,
+    end_time INTEGER NOT NULL,
+    plan_duration INTEGER NOT NULL,
+    amount REAL NOT NULL,
+    currency TEXT NOT NULL CHECK (currency IN ('INR', 'USD')), -- Enum-like check
+    is_expired INTEGER DEFAULT 0 CHECK (is_expired IN (0, 1)), -- BOOLEAN stored as INTEGER
+    is_active INTEGER DEFAULT 1 CHECK (is_active IN (0, 1)),
+    sent_expiry_notification INTEGER DEFAULT 0 CHECK (sent_expiry_notification IN (0, 1)),
+    FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
+    FOREIGN KEY (telegram_id) REFERENCES telegram_users(tg_user_id) ON DELETE SET NULL
+    """,
+)
+
+create_table(
+    "exchange_rates",
+    """
+    base TEXT NOT NULL,
+    quote TEXT NOT NULL,
+    rate REAL NOT NULL,
+    fetched_at INTEGER NOT NULL,
+    PRIMARY KEY (base, quote)
+    """,
+)
+
+create_table(
+    "payments",
+    """
+    payment_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    amount REAL NOT NULL,
+    currency TEXT NOT NULL CHECK (currency IN ('INR', 'USD')),
+    payment_date INTEGER NOT NULL,
+    balance_after REAL DEFAULT NULL, -- running balance, set by ledger_payment_insert
+    FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+    """,
+)
+
+indexes = [
+    "CREATE INDEX IF NOT EXISTS idx_users_uuid ON users(uuid);",
+    "CREATE INDEX IF NOT EXISTS idx_users_linux_username ON users(linux_username);",
+    "CREATE INDEX IF NOT EXISTS idx_telegram_users_user_id ON telegram_users(user_id);",
+    "CREATE INDEX IF NOT EXISTS idx_rentals_user_id ON rentals(user_id);",
+    """CREATE INDEX IF NOT EXISTS idx_rentals_telegram_id ON rentals(telegram_id)
+    WHERE telegram_id IS NOT NULL;""",
+    # Partial indexes for the notify_expiry scans: they only cover the
+    # (few) live rentals still waiting for a warning or an expiry. The scans
+    # name them with INDEXED BY, since idx_rentals_active_end qualifies too.
+    """CREATE INDEX IF NOT EXISTS idx_rentals_pending_warning ON rentals(end_time)
+    WHERE sent_expiry_notification = 0 AND is_active = 1;""",
+    """CREATE INDEX IF NOT EXISTS idx_rentals_pending_expiry ON rentals(end_time)
+    WHERE is_expired = 0 AND is_active = 1;""",
+    # Keyset pages of /list_users sorted by expiry. idx_rentals_live_end was
+    # an earlier, narrower version of idx_rentals_active_end.
+    "DROP INDEX IF EXISTS idx_rentals_live_end;",
+    """CREATE INDEX IF NOT EXISTS idx_rentals_active_end ON rentals(end_time)
+    WHERE is_active = 1;""",
+    """CREATE INDEX IF NOT EXISTS idx_rentals_expired_end ON rentals(end_time)
+    WHERE is_expired = 1 AND is_active = 1;""",
+    "CREATE INDEX IF NOT EXISTS idx_payments_user_date ON payments(user_id, payment_date);",
+    # Covering index for the per-user payment totals in the report.
+    """CREATE INDEX IF NOT EXISTS idx_payments_user_currency
+    ON payments(user_id, currency, amount);""",
+]
+
+for index in indexes:
+    db.execute_sync(index)
+
+# Per-day and per-month earnings, kept current by triggers on payments.
+for statement in SUMMARY_TABLES:
+    db.execute_sync(statement)
+for statement in trigger_statements(utc_offset_minutes()):
+    db.execute_sync(statement)
+if db.transaction_sync(needs_backfill):
+    db.transaction_sync(rebuild_earnings_summary, utc_offset_minutes())
+
+# Running balances over the append-only payments ledger.
+db.execute_sync(BALANCES_TABLE)
+backfilled = db.transaction_sync(migrate_ledger)
+if backfilled:
+    print(f"Backfilled running balances for {backfilled} payments.")
+for statement in ledger_trigger_statements():
+    db.execute_sync(statement)
+
+# --- Hot Queries ---
+BROADCAST_RECIPIENTS_QUERY = (
+    "SELECT telegram_id FROM rentals WHERE (telegram_id IS NOT NULL) AND (is_active = 1)"
+)
+
+LINKED_TELEGRAM_USER_QUERY = "SELECT tg_user_id from telegram_users WHERE user_id = ?"
+
+# Each hot query with dummy parameters and the index it is expected to use.
+HOT_QUERIES = [
+    ("expiry warning scan", EXPIRING_RENTALS_QUERY, (0, 0), "idx_rentals_pending_warning"),
+    ("expiry scan", EXPIRED_RENTALS_QUERY, (0,), "idx_rentals_pending_expiry"),
+    ("payment history page", history_query("n"), (0, 0, 0, 0), "idx_payments_user_date"),
+    ("broadcast recipients", BROADCAST_RECIPIENTS_QUERY, (), "idx_rentals_telegram_id"),
+    ("telegram link lookup", LINKED_TELEGRAM_USER_QUERY, (0,), "idx_telegram_users_user_id"),
+    ("payments report", PAYMENTS_REPORT_QUERY, (), "idx_payments_user_currency"),
+    ("earnings by day", DAY_RANGE_QUERY, ("", ""), "PRIMARY KEY"),
+    ("user balance", BALANCE_QUERY, (0,), "PRIMARY KEY"),
+    ("user list page", ListView().page_query("n"), (0, 0, 0), "idx_rentals_active_end"),
+    (
+        "expired user list page",
+        ListView(filter="x").page_query("n"),
+        (0, 0, 0),
+        "idx_rentals_expired_end",
+    ),
+]
+
+
+def check_query_plans():
+    """
+    Run EXPLAIN QUERY PLAN on every hot query and report the ones that no
+    longer use their index.
+    """
+    for name, query, params, index in HOT_QUERIES:
+        plan = db.explain_sync(query, params)
+        if not any(index in step for step in plan):
+            print(
+                f"Warning: query plan regression for {name}: expected {index}, "
+                f"got: {'; '.join(plan)}"
+            )
+
+
+check_query_plans()
+
+
+# --- Authorization ---
+def is_authorized_user(user_id):
+    return user_id == ADMIN_ID
+
+
+def is_authorized_group(group_id):
+    return group_id == GROUP_ID
+
+
+# --- Utility Functions ---
+def generate_password():
+    return (
+        random.choice(ADJECTIVES)
+        + random.choice(NOUNS)
+        + "".join(random.choices(string.digits, k=4))
+    )
+
+
+def is_user_exists(username):
+    return account_index.exists(username)
+
+
+def parse_duration(duration_str: str):
+    duration_str = duration_str.lower()
+    total_seconds = 0
+    current_number = ""
+    for char in duration_str:
+        if char.isdigit():
+            current_number += char
+        else:
+            if char in "dhms" and not current_number:
+                raise ValueError(f"invalid duration `{duration_str}`: no number before `{char}`")
+            if char == "d":
+                total_seconds += int(current_number) * 24 * 60 * 60
+            elif char == "h":
+                total_seconds += int(current_number) * 60 * 60
+            elif char == "m":
+                total_seconds += int(current_number) * 60
+            elif char == "s":
+                total_seconds += int(current_number)
+            current_number = ""
+    return total_seconds
+
+
+def parse_duration_to_human_readable(duration_seconds: int) -> str:
+    if duration_seconds <= 0:
+        return "Expired"
+
+    duration_str = ""
+    if duration_seconds // (24 * 3600) > 0:
+        duration_str += f"{duration_seconds // (24 * 3600)} days, "
+        duration_seconds %= 24 * 3600
+    if duration_seconds // 3600 > 0:
+        duration_str += f"{duration_seconds // 3600} hours, "
+        duration_seconds %= 3600
+    if duration_seconds // 60 > 0:
+        duration_str += f"{duration_seconds // 60} minutes, "
+        duration_seconds %= 60
+    if duration_seconds > 0:
+        duration_str += f"{duration_seconds} seconds"
+    return duration_str
+
+
+async def get_exchange_rate(from_currency, to_currency):
+    return await exchange_rates.get_rate(from_currency, to_currency)
+
+
+# --- System User Management ---
+async def create_system_user(username, password):
+    return True
+    hashed_password = await provisioner.hash_password(password)
+    await provisioner.create_user(username, hashed_password)
+    print(f"System user {username} created successfully.")
+
+
+async def rotate_passwords(usernames):
+    """
+    Give every user a new random password, hashed in-process and applied
+    with a single chpasswd call. chpasswd rejects the whole batch if any
+    line fails, so users without a system account are left out, and if the
+    batch still fails each user is retried on their own.
+
+    Returns ``(passwords, failures)``: ``{username: password}`` for the
+    rotated users and ``{username: reason}`` for the rest.
+    """
+    existing = await asyncio.to_thread(account_index.exists_many, usernames)
+    failures = {
+        username: "no system account" for username in usernames if username not in existing
+    }
+    passwords = {
+        username: generate_password() for username in usernames if username in existing
+    }
+    if not passwords:
+        return passwords, failures
+
+    hashes = await provisioner.hash_passwords(passwords)
+    try:
+        await provisioner.set_password_hashes(hashes)
+        return passwords, failures
+    except ProvisioningError:
+        pass
+
+    results = await asyncio.gather(
+        *(provisioner.set_password_hashes([pair]) for pair in hashes),
+        return_exceptions=True,
+    )
+    for (username, _), result in zip(hashes, results):
+        if isinstance(result, ProvisioningError):
+            failures[username] = str(result)
+            del passwords[username]
+        elif isinstance(result, BaseException):
+            raise result
+    return passwords, failures
+
+
+async def change_password(username):
+    """
+    Change the password of a system user
+    """
+    passwords, failures = await rotate_passwords([username])
+    if username in failures:
+        raise RuntimeError(f"Password change for {username} failed: {failures[username]}")
+    return passwords[username]
+
+
+async def remove_ssh_auth_keys(username) -> tuple[bool, str]:
+    """
+    Remove the SSH authorized keys for a system user
+    """
+    result = await provisioner.remove_ssh_keys(username)
+    if not result.ok:
+        return (False, f"No authorized keys found for user {username}.")
+    return (True, f"Authorized keys removed for user {username}.")
+
+
+async def delete_system_user(username, event):
+    await client.send_message(ADMIN_ID, f"🗑️ Deleting user `{username}`...")
+    await provisioner.kill_processes(username)
+    result = await provisioner.delete_user(username)
+    if not result.ok:
+        await event.edit(f"❌ Error deleting user `{username}`: {result.error()}")
+        return
+
+    # Set the is_active to False for the user
+    def _deactivate(cursor, user_id):
+        rental_ids = cursor.execute(
+            "SELECT rental_id FROM rentals WHERE user_id = ?", (user_id,)
+        ).fetchall()
+        cursor.execute(
+            "UPDATE rentals SET is_active = 0 WHERE user_id = ?", (user_id,)
+        )
+        cursor.execute("DELETE FROM users WHERE user_id = ?", (user_id,))
+        return rental_ids
+
+    user_id = await user_keys.user_id(username)
+    if user_id is not None:
+        for (rental_id,) in await db.transaction(_deactivate, user_id):
+            expiry_scheduler.discard(rental_id)
+        user_keys.invalidate(username)
+    await event.respond(f"✅ User `{username}` deleted.")
+
+
+reconciler = Reconciler(
+    db,
+    account_index,
+    provisioner,
+    uid_min=RENTAL_UID_MIN,
+    uid_max=RENTAL_UID_MAX,
+    ignore=SYNC_IGNORE_USERS,
+)
+
+
+# --- Plan Management ---
+async def reschedule_expiry(user_id):
+    """
+    Re-key the expiry scheduler after a user's rental rows changed.
+    """
+    rows = await db.fetchall(
+        """SELECT rental_id, end_time, sent_expiry_notification, is_expired, is_active
+        FROM rentals WHERE user_id = ?""",
+        (user_id,),
+    )
+    for row in rows:
+        expiry_scheduler.update(*row)
+
+
+async def modify_plan_duration(
+    event, username, duration_change_seconds, action="reduced"
+):
+    user_id = await user_keys.user_id(username)
+    result = None
+    if user_id is not None:
+        result = await db.fetchone(
+            "SELECT end_time FROM rentals WHERE user_id = ?", (user_id,)
+        )
+
+    if not result:
+        await event.respond(f"❌ User `{username}` not found.")
+        return
+
+    expiry_time = result[0]
+    new_expiry_time = expiry_time + duration_change_seconds
+
+    if new_expiry_time < int(time.time()) and action == "reduced":
+        await event.respond(
+            f"❌ User `{username}` will already be expired with this duration."
+        )
+        return
+
+    await db.execute(
+        "UPDATE rentals SET end_time=? WHERE user_id = ?",
+        (new_expiry_time, user_id),
+    )
+    await reschedule_expiry(user_id)
+
+    new_expiry_date_str = get_date_str(new_expiry_time)
+    duration_change_str = parse_duration_to_human_readable(abs(duration_change_seconds))
+
+    await event.respond(
+        f"🔄 User `{username}`'s plan {action}!"
+        f"\nNew expiry date: `{new_expiry_date_str}`"
+        f"\nDuration {action} by: `{duration_change_str}`"
+    )
+
+
+async def extend_plan_helper(
+    event, username, additional_seconds, send_notification=True
+):
+    await modify_plan_duration(event, username, additional_seconds, action="extended")
+    user_id = await user_keys.user_id(username)
+    if user_id is None:
+        return
+    await db.execute(
+        """
+        UPDATE rentals
+        SET sent_expiry_notification = 0, 
+            is_expired = 0 
+        WHERE user_id = ?;
+        """,
+        (user_id,),
+    )
+    await reschedule_expiry(user_id)
+
+    # Send notification to the user
+    if send_notification:
+        result = await db.fetchone(
+            """
+            SELECT r.telegram_id, t.tg_first_name, r.end_time
+            FROM rentals r
+            LEFT JOIN telegram_users t ON r.telegram_id = t.tg_user_id
+            WHERE r.user_id = ?
+            """,
+            (user_id,),
+        )
+        if result:
+            tg_user_id, user_first_name, expiry_time = result
+            remaining_time_str = parse_duration_to_human_readable(additional_seconds)
+            expiry_date_str = get_date_str(expiry_time)
+            message = (
+                f"Dear {user_first_name},\n\n"
+                f"🔥 Your plan has been extended by `{remaining_time_str}`.\n"
+                f"📅 New expiry date: `{expiry_date_str}`"
+                f"\n\n Enjoy your server! 🚀"
+            )
+            await client.send_message(tg_user_id, message)
+
+
+async def reduce_plan_helper(
+    event, username, reduced_duration_seconds, send_notification=True
+):
+    await modify_plan_duration(
+        event, username, -reduced_duration_seconds, action="reduced"
+    )
+
+
+def make_fanout(build_message):
+    """
+    Create a rate-limited FanOut that sends ``build_message(chat_id)`` to
+    each chat, treating Telegram's flood and blocked errors accordingly.
+    """
+    return FanOut(
+        lambda chat_id: client.send_message(chat_id, build_message(chat_id)),
+        flood_errors=(FloodWaitError,),
+        blocked_errors=(
+            UserIsBlockedError,
+            InputUserDeactivatedError,
+            PeerIdInvalidError,
+        ),
+    )
+
+
+async def notify_plan_changes(changed, duration_change_seconds):
+    """
+    Tell every linked customer about a bulk plan change through the
+    rate-limited fan-out engine. Returns its FanOutResult.
+    """
+    action = "extended" if duration_change_seconds >= 0 else "reduced"
+    change_str = parse_duration_to_human_readable(abs(duration_change_seconds))
+    changed = [row for row in changed if row[5]]
+    expiry_strs = format_dates(row[1] for row in changed)
+    messages = {
+        telegram_id: (
+            f"Dear {first_name},\n\n"
+            f"🔥 Your plan has been {action} by `{change_str}`.\n"
+            f"📅 New expiry date: `{expiry_date_str}`"
+        )
+        for (_, _, _, _, _, telegram_id, first_name, _), expiry_date_str in zip(
+            changed, expiry_strs
+        )
+    }
+    return await make_fanout(messages.get).run(messages)
+
+
+async def bulk_modify_plans(event, duration_change_seconds, notify=False):
+    """
+    Apply a plan change to every user with a single UPDATE and reply with
+    one summary instead of one message per user.
+    """
+    changed, skipped = await db.transaction(
+        shift_all_rentals, duration_change_seconds, int(time.time())
+    )
+    for rental_id, end_time, sent_notification, is_expired, is_active, *_ in changed:
+        expiry_scheduler.update(
+            rental_id, end_time, sent_notification, is_expired, is_active
+        )
+
+    action = "extended" if duration_change_seconds >= 0 else "reduced"
+    change_str = parse_duration_to_human_readable(abs(duration_change_seconds))
+    response = f"🔄 Plans of {len(changed)} user(s) {action} by `{change_str}`."
+    if skipped:
+        response += (
+            f"\n⚠️ Skipped {skipped} user(s) that would already be expired."
+        )
+    summary = await event.respond(response)
+
+    if notify:
+        result = await notify_plan_changes(changed, duration_change_seconds)
+        await summary.edit(
+            response
+            + f"\n📨 Notified {result.sent} user(s), {result.failed} failed, "
+            f"{result.blocked} blocked."
+        )
+
+
+# --- Payment Management ---
+async def process_payment(event, username, amount_str, currency, debit=False):
+    """
+    Record a payment in INR and return its (positive) amount; a debit is
+    stored as a negative amount so it comes off the earnings.
+    """
+    if currency == "USD":
+        try:
+            amount = float(amount_str)
+            exchange_rate = await get_exchange_rate("USD", "INR")
+            amount_inr = amount * exchange_rate
+        except (ValueError, KeyError, ExchangeRateUnavailable):
+            await event.respond("❌ Invalid amount or currency.")
+            return
+    elif currency == "INR":
+        try:
+            amount_inr = float(amount_str)
+        except ValueError:
+            await event.respond("❌ Invalid amount.")
+            return
+    else:
+        await event.respond("❌ Invalid currency. Only INR and USD are supported.")
+        return
+
+    user_id = await user_keys.user_id(username)
+    if user_id is None:
+        await event.respond(f"❌ User `{username}` not found.")
+        return
+
+    payment_date = int(time.time())
+
+    await db.execute(
+        """
+    INSERT INTO payments (user_id, amount, currency, payment_date)
+    VALUES (?, ?, ?, ?)
+    """,
+        (user_id, -amount_inr if debit else amount_inr, "INR", payment_date),
+    )
+    return amount_inr
+
+
+async def record_transaction(event, username, amount_str, currency, transaction_type):
+    amount_inr = await process_payment(
+        event, username, amount_str, currency, debit=transaction_type == "debit"
+    )
+    if amount_inr is None:
+        return  # Error occurred during processing
+
+    if transaction_type == "debit":
+        amount_inr = -amount_inr
+
+    await event.respond(
+        f"✅ Amount `{amount_inr:.2f} INR` {transaction_type}ed from user `{username}`."
+    )
+
+
+# --- Decorators ---
+def authorized_user(func):
+    async def wrapper(event, *args, **kwargs):
+        if not is_authorized_user(event.sender_id):
+            await event.respond("❌ You are not authorized to use this command.")
+            return
+        return await func(event, *args, **kwargs)
+
+    return wrapper
+
+
+# --- Telegram Bot Commands ---
+
+
+# /reduce_plan command
+@client.on(events.NewMessage(pattern="/reduce_plan"))
+@authorized_user
+async def reduce_plan(event):
+
+    args = event.message.text.split()
+    notify = args[-1].lower() == "notify"
+    if notify:
+        args = args[:-1]
+    if len(args) < 3:
+        await event.respond(
+            "❓ Usage: /reduce_plan <username> <reduced_duration> [notify]\nFor example: `/reduce_plan john 7d`"
+        )
+        return
+
+    username = args[1]
+    reduced_duration_str = args[2]
+    reduced_duration_seconds = parse_duration(reduced_duration_str)
+
+    if username == "all":
+        await bulk_modify_plans(event, -reduced_duration_seconds, notify=notify)
+    else:
+        await reduce_plan_helper(event, username, reduced_duration_seconds)
+
+
+# /sync_db command
+@client.on(events.NewMessage(pattern="/sync_db"))
+@authorized_user
+async def sync_db(event):
+    args = event.message.text.split()
+    apply = len(args) > 1 and args[1].lower() == "apply"
+
+    status = await event.respond("🔍 Comparing the database with the system...")
+    plan = await reconciler.plan()
+    if not plan.actionable or not apply:
+        buttons = [[Button.inline("✅ Apply", data="sync_apply")]] if plan.actionable else None
+        await status.edit(plan.summary(), buttons=buttons)
+        return
+
+    await status.edit("🔄 Applying changes...")
+    result = await reconciler.apply(plan)
+    await status.edit(plan.summary() + "\n\n" + result.summary())
+
+
+# /create_user command
+@client.on(events.NewMessage(pattern=r"/create_user\b"))
+@authorized_user
+async def create_user(event):
+
+    BOT_USERNAME = await client.get_me()
+
+    args = event.message.text.split()
+    if len(args) < 4:
+        await event.respond(
+            "❓ Usage: /create_user <username> <plan_duration> <amount> <currency (INR/USD)> \nFor example: `/create_user john 7d 500 INR`"
+        )
+        return
+
+    await event.respond("🔐 Creating user...")
+
+    username = args[1]
+    plan_duration_str = args[2]
+    amount_str = args[3]
+    currency = args[4].upper()
+
+    if is_user_exists(username):
+        await event.respond(f"❌ User `{username}` already exists.")
+        return
+
+    plan_duration_seconds = parse_duration(plan_duration_str)
+    password = generate_password()
+
+    expiry_time = int(time.time()) + plan_duration_seconds
+
+    try:
+        await create_system_user(username, password)
+    except Exception as e:
+        await event.respond(f"❌ Error creating user `{username}`: {e}")
+        return
+
+    expiry_date_str = get_date_str(expiry_time)
+    ssh_command = f"ssh {username}@{SSH_HOSTNAME} -p {SSH_PORT}"
+
+    message_str = (
+        f"✅ User `{username}` created successfully.\n\n"
+        f"🔐 **Username:** `{username}`\n"
+        f"📅 **Expiry Date:** {expiry_date_str}\n"
+        f"\n"
+        f"🔗 **SSH Command:**\n"
+        f"`{ssh_command}`\n"
+        f"\n"
+        f"🔑 **Password:** Please click the button below to get your password.\n\n"
+    )
+
+    if BE_NOTED_TEXT:
+        message_str += f"**ℹ️ Notes:**\n{BE_NOTED_TEXT}\n"
+
+    message_str += f"\n🔒 Your server is ready to use. Enjoy!"
+
+    user_uuid = str(uuid.uuid4())
+    password_url = f"https://t.me/{BOT_USERNAME.username}?start={user_uuid}"
+
+    payment_date = int(time.time())
+
+    def _insert_user(cursor):
+        cursor.execute(
+            """
+        INSERT INTO users (uuid, linux_username, linux_password)
+        VALUES (?, ?, ?)
+        ON CONFLICT(linux_username) DO UPDATE SET uuid=excluded.uuid;
+        """,
+            (user_uuid, username, password),
+        )
+        (user_id,) = cursor.execute(
+            "SELECT user_id FROM users WHERE linux_username=?", (username,)
+        ).fetchone()
+
+        cursor.execute(
+            """
+        INSERT INTO rentals (user_id, start_time, end_time, plan_duration, amount, currency)
+        VALUES (?, ?, ?, ?, ?, ?);
+        """,
+            (
+                user_id,
+                int(time.time()),
+                expiry_time,
+                plan_duration_seconds,
+                amount_str,
+                currency,
+            ),
+        )
+        return user_id
+
+    user_id = await db.transaction(_insert_user)
+    user_keys.invalidate(username)
+    await reschedule_expiry(user_id)
+
+    await client.send_message(
+        event.chat_id,
+        message_str,
+        buttons=[[Button.url("Get Password", password_url)]],
+    )
+
+    amount_inr = await process_payment(event, username, amount_str, currency)
+    if amount_inr is None:
+        return  # Error occurred during processing
+
+    message_str = (
+        f"🔐 **Username:** `{username}`\n"
+        f"🔑 **Password:** `{password}`\n"
+        f"📅 **Expiry Date:** {expiry_date_str}\n"
+        f"💰 **Amount:** `{amount_inr:.2f} INR`\n"
+        f"📅 **Payment Date:** {get_date_str(payment_date)}\n"
+    )
+
+    await client.send_message(ADMIN_ID, message_str)
+
+
+async def remove_created_accounts(usernames):
+    """
+    Delete the accounts of a failed /create_users batch. Returns a note
+    listing any that could not be removed, or "".
+    """
+    results = await asyncio.gather(
+        *(provisioner.delete_user(username) for username in usernames)
+    )
+    leftover = [username for username, result in zip(usernames, results) if not result.ok]
+    if not leftover:
+        return ""
+    return (
+        f"\n⚠️ Could not remove {len(leftover)} account(s), delete them by hand: "
+        + ", ".join(f"`{username}`" for username in leftover)
+    )
+
+
+# /create_users command (bulk onboarding from a CSV/JSON document)
+@client.on(events.NewMessage(pattern="/create_users"))
+@authorized_user
+async def create_users(event):
+
+    message = event.message
+    if not message.document and message.is_reply:
+        message = await event.get_reply_message()
+    if not message or not message.document:
+        await event.respond(
+            "❓ Usage: send a CSV or JSON file with the caption `/create_users`, "
+            "or reply to one with it.\n"
+            "Fields: `username, duration, amount, currency`\n"
+            "For example: `john,30d,500,INR`"
+        )
+        return
+
+    status = await event.respond("📥 Validating tenants...")
+    data = await message.download_media(bytes)
+    tenants, errors = parse_tenant_file(
+        data, message.file.name or "", parse_duration
+    )
+
+    usernames = [tenant.username for tenant in tenants]
+    for username in await asyncio.to_thread(account_index.exists_many, usernames):
+        errors.append(f"User `{username}` already exists on the system.")
+    for i in range(0, len(usernames), MAX_IN_PARAMS):
+        chunk = usernames[i : i + MAX_IN_PARAMS]
+        rows = await db.fetchall(
+            f"""SELECT linux_username FROM users
+            WHERE linux_username IN ({", ".join("?" * len(chunk))})""",
+            chunk,
+        )
+        errors.extend(f"User `{username}` already exists in the database." for (username,) in rows)
+
+    exchange_rate = None
+    if not errors and any(tenant.currency == "USD" for tenant in tenants):
+        try:
+            exchange_rate = await get_exchange_rate("USD", "INR")
+        except (KeyError, ExchangeRateUnavailable) as e:
+            errors.append(f"Could not get the USD exchange rate: {e}")
+
+    if errors:
+        shown = "\n".join(errors[:30])
+        more = f"\n...and {len(errors) - 30} more." if len(errors) > 30 else ""
+        await status.edit(
+            f"❌ No users created, {len(errors)} problem(s) found:\n\n{shown}{more}"
+        )
+        return
+
+    for tenant in tenants:
+        tenant.password = generate_password()
+        tenant.uuid = str(uuid.uuid4())
+        tenant.amount_inr = (
+            tenant.amount * exchange_rate if tenant.currency == "USD" else tenant.amount
+        )
+
+    await status.edit(f"🔐 Creating {len(tenants)} user(s)...")
+    try:
+        await provisioner.create_users(
+            {tenant.username: tenant.password for tenant in tenants}
+        )
+    except ProvisioningError as e:
+        # newusers may have stopped partway: remove the accounts it did
+        # create so the corrected batch can be retried.
+        created = await asyncio.to_thread(account_index.exists_many, usernames)
+        await status.edit(
+            f"❌ Error creating users, the accounts created so far were removed: {e}"
+            + await remove_created_accounts(sorted(created))
+        )
+        return
+
+    now = int(time.time())
+    try:
+        rentals = await db.transaction(insert_tenants, tenants, now)
+    except Exception as e:
+        # The accounts exist but have no rentals: take them back out so the
+        # batch can simply be retried.
+        await status.edit(
+            f"❌ Error saving users, the created accounts were removed: {e}"
+            + await remove_created_accounts(usernames)
+        )
+        return
+    for rental_id, end_time in rentals:
+        expiry_scheduler.update(rental_id, end_time, 0, 0, 1)
+    for tenant in tenants:
+        user_keys.invalidate(tenant.username)
+
+    total_inr = sum(tenant.amount_inr for tenant in tenants)
+    await status.edit(
+        f"✅ Created {len(tenants)} user(s).\n"
+        f"💰 **Total Amount:** `{total_inr:.2f} INR`\n\n"
+        f"🔗 Forward each user their button below to get their password."
+    )
+
+    BOT_USERNAME = await client.get_me()
+    buttons = [
+        [
+            Button.url(
+                tenant.username,
+                f"https://t.me/{BOT_USERNAME.username}?start={tenant.uuid}",
+            )
+        ]
+        for tenant in tenants
+    ]
+    # Telegram allows at most 100 buttons per message.
+    for i in range(0, len(buttons), 100):
+        await client.send_message(
+            event.chat_id,
+            f"🔑 Password links ({i + 1}-{min(i + 100, len(buttons))}):",
+            buttons=buttons[i : i + 100],
+        )
+
+    credentials = io.StringIO()
+    writer = csv.writer(credentials)
+    writer.writerow(["username", "password", "expiry_date", "amount_inr"])
+    for tenant in tenants:
+        writer.writerow(
+            [
+                tenant.username,
+                tenant.password,
+                get_date_str(now + tenant.duration_seconds),
+                f"{tenant.amount_inr:.2f}",
+            ]
+        )
+    credentials_file = io.BytesIO(credentials.getvalue().encode())
+    credentials_file.name = "created_users.csv"
+    await client.send_file(ADMIN_ID, credentials_file, caption="🔐 New user credentials")
+
+
+# /debit and /credit commands
+@client.on(events.NewMessage(pattern="/debit"))
+@authorized_user
+async def debit_amount(event):
+
+    args = event.message.text.split()
+    if len(args) < 3:
+        await event.respond(
+            "❓ Usage: /debit <username> <amount> <currency>\nFor example: `/debit john 500 INR`"
+        )
+        return
+
+    username = args[1]
+    amount_str = args[2]
+    currency = args[3].upper()
+
+    await record_transaction(event, username, amount_str, currency, "debit")
+
+
+@client.on(events.NewMessage(pattern="/credit"))
+@authorized_user
+async def credit_amount(event):
+
+    args = event.message.text.split()
+    if len(args) < 3:
+        await event.respond(
+            "❓ Usage: /credit <username> <amount> <currency>\nFor example: `/credit john 500 INR`"
+        )
+        return
+
+    username = args[1]
+    amount_str = args[2]
+    currency = args[3].upper()
+
+    await record_transaction(event, username, amount_str, currency, "credit")
+
+
+# /help command
+@client.on(events.NewMessage(pattern="/help"))
+@authorized_user
+async def help_command(event):
+
+    help_text = """
+
+    🔐 **Admin Commands:**
+
+    - `/create_user <username> <plan_duration> <amount> <currency>`: Create a user with a plan duration and amount.
+    - `/create_users` (caption of a CSV/JSON file): Create many users at once.
+    - `/reduce_plan <username> <reduced_duration> [notify]`: Reduce the plan duration for a user, or `all` users at once (`notify` messages them).
+    - `/sync_db [apply]`: Show drift between the database and the system accounts (`apply` fixes it).
+    - `/debit <username> <amount> <currency>`: Debit the amount from the user.
+    - `/credit <username> <amount> <currency>`: Credit the amount to the user.
+    - `/earnings [today|month|year|<from>..<to>]`: Show the earnings, overall or for a period (dates as `YYYY-MM-DD`).
+    - `/rebuild_earnings`: Recompute the earnings summaries from the payments.
+    - `/stats`: Show internal cache statistics.
+    - `/delete_user <username>`: Delete a user.
+    - `/extend_plan <username> <additional_duration> [amount] [currency] [notify]`: Extend a user's plan, or `all` users' plans at once (`notify` messages them).
+    - `/payment_history <username> [csv]`: Show the payment history for a user page by page, with the balance after each entry (`csv` sends the full history as a file).
+    - `/balance <username>`: Show a user's current balance.
+    - `/gen_report [pdf|fpdf|html|csv]`: Generate the users and payments report.
+    - `/unlink_user <username>`: Clear the Telegram username and user id for a user.
+    - `/list_users [all|active|expired|expiring <duration>] [expiry|name]`: List users page by page with their expiry dates and remaining time.
+    - `/who`: Show which tenants are logged in and for how long.
+    - `/broadcast <message>`: Broadcast a message to all users.
+    - `/link_user <username>`: Link a Telegram user to a system user.
+    """
+
+    await event.respond(help_text)
+
+
+# /earnings command
+EARNINGS_BREAKDOWN_LIMIT = 40
+
+
+def format_earnings(title, earnings):
+    response = (
+        f"💰 **{title}:** `{earnings.total:.2f} INR` "
+        f"({earnings.payments} payments)\n"
+    )
+    if 1 < len(earnings.breakdown) <= EARNINGS_BREAKDOWN_LIMIT:
+        response += "\n" + "".join(
+            f"📅 `{label}`: `{total:.2f} INR` ({payments})\n"
+            for label, total, payments in earnings.breakdown
+        )
+    return response
+
+
+def parse_earnings_period(arg, today):
+    """
+    Return ``(title, start, end, by_month)`` for an /earnings argument, or
+    None if it is not a period.
+    """
+    if arg == "today":
+        return "Today's Earnings", today, today, False
+    if arg == "month":
+        return "This Month's Earnings", today.replace(day=1), today, False
+    if arg == "year":
+        return "This Year's Earnings", today.replace(month=1, day=1), today, True
+    start, sep, end = arg.partition("..")
+    if not sep:
+        return None
+    try:
+        start, end = date.fromisoformat(start), date.fromisoformat(end)
+    except ValueError:
+        return None
+    if start > end:
+        return None
+    # Long ranges are broken down by month instead of by day.
+    return f"Earnings {start} to {end}", start, end, (end - start).days > 62
+
+
+@client.on(events.NewMessage(pattern=r"/earnings\b"))
+@authorized_user
+async def show_earnings(event):
+
+    args = event.message.text.split()
+    today = local_today()
+    if len(args) < 2:
+        total, payments = await db.fetchone(ALL_TIME_QUERY, reader=True)
+        month = await db.read(earnings_between, today.replace(day=1), today)
+        day = await db.read(earnings_between, today, today)
+        await event.respond(
+            f"💰 **Total Earnings:** `{total:.2f} INR` ({payments} payments)\n"
+            f"🗓️ **This Month:** `{month.total:.2f} INR`\n"
+            f"📅 **Today:** `{day.total:.2f} INR`"
+        )
+        return
+
+    period = parse_earnings_period(args[1].lower(), today)
+    if period is None:
+        await event.respond(
+            "❓ Usage: /earnings [today|month|year|<from>..<to>]\n"
+            "For example: `/earnings 2024-01-01..2024-03-31`"
+        )
+        return
+    title, start, end, by_month = period
+    earnings = await db.read(earnings_between, start, end, by_month)
+    await event.respond(format_earnings(title, earnings))
+
+
+# /rebuild_earnings command
+@client.on(events.NewMessage(pattern="/rebuild_earnings"))
+@authorized_user
+async def rebuild_earnings(event):
+
+    (old_total, old_payments), (total, payments) = await db.transaction(
+        rebuild_earnings_summary, utc_offset_minutes()
+    )
+    response = f"🔄 Earnings summaries rebuilt: `{total:.2f} INR` ({payments} payments)."
+    if abs(old_total - total) >= 0.005 or old_payments != payments:
+        response += (
+            f"\n⚠️ They had drifted: `{old_total:.2f} INR` ({old_payments} payments) before."
+        )
+    await event.respond(response)
+
+
+# /stats command
+@client.on(events.NewMessage(pattern="/stats"))
+@authorized_user
+async def show_stats(event):
+
+    await event.respond(
+        f"📊 **Username cache:** `{user_keys.stats()}`\n"
+        f"💱 **Exchange rates:** `{exchange_rates.stats()}`\n"
+        f"📄 **Report cache:** `{report_cache.stats()}`\n"
+        f"🟢 **Sessions:** `{session_monitor.stats()}`"
+    )
+
+
+# /delete_user command
+@client.on(events.NewMessage(pattern="/delete_user"))
+@authorized_user
+async def delete_user_command(event):
+
+    if len(event.message.text.split()) < 2:
+        await event.respond("❓ Usage: /delete_user <username>")
+        return
+
+    username = event.message.text.split()[1]
+    result = await user_keys.get(username)
+
+    user_exists = is_user_exists(username)
+
+    if not user_exists:
+        await event.respond(f"❌ User `{username}` is not found in the system.")
+
+        await event.respond(
+            f"❓ Do you want to delete user `{username}` from the database?",
+            buttons=[
+                [Button.inline("Yes", data=f"clean_db {username}")],
+                [Button.inline("No", data="cancel")],
+            ],
+        )
+        return
+
+    if result:
+        await delete_system_user(username, event)
+    else:
+        await event.respond(f"❌ User `{username}` not found.")
+
+
+# /extend_plan command
+@client.on(events.NewMessage(pattern="/extend_plan"))
+@authorized_user
+async def extend_plan(event):
+
+    args = event.message.text.split()
+    notify = args[-1].lower() == "notify"
+    if notify:
+        args = args[:-1]
+    if len(args) < 3:
+        await event.respond(
+            "❓ Usage: /extend_plan <username> <additional_duration> [amount] [currency] [notify]\nFor example: `/extend_plan john 5d 500 INR`"
+        )
+        return
+
+    username = args[1]
+    if username == "all" and len(args) > 3:
+        await event.respond(
+            "❌ An amount can't be recorded for `all` users. Extend the plans first, "
+            "then record each payment with `/credit <username> <amount> <currency>`."
+        )
+        return
+
+    await event.respond("🔄 Extending plan...")
+
+    additional_duration_str = args[2]
+    additional_seconds = parse_duration(additional_duration_str)
+
+    amount_inr = None
+    if len(args) >= 5:
+        amount_str = args[3]
+        currency = args[4].upper()
+        amount_inr = await process_payment(event, username, amount_str, currency)
+        if amount_inr is None:
+            return
+
+    if username == "all":
+        await bulk_modify_plans(event, additional_seconds, notify=notify)
+    else:
+        await extend_plan_helper(event, username, additional_seconds)
+
+    if amount_inr is not None:
+        await event.respond(
+            f"✅ Amount `{amount_inr:.2f} INR` credited to user `{username}`."
+        )
+
+
+# /payment_history command
+async def render_payment_history(username, user_id, direction=None, after=None):
+    """
+    Build the text and navigation buttons for one page of /payment_history.
+    """
+    rows, has_prev, has_next, balances = await db.read(
+        fetch_history_page, user_id, direction, after
+    )
+    if not rows:
+        return f"🔍 No payment history found for `{username}`.", None
+
+    response = f"💳 Payment History for `{username}`:\n"
+    for currency, balance, entries, _ in balances:
+        response += f"🧾 Balance: `{balance:.2f} {currency}` ({entries} entries)\n"
+    response += "\n"
+    for _, amount, currency, payment_date, balance_after in rows:
+        balance_str = "-" if balance_after is None else f"{balance_after:.2f} {currency}"
+        response += (
+            f"💰 Amount: `{amount:+.2f} {currency}`\n"
+            f"📅 Date: `{get_date_str(payment_date)}`\n"
+            f"🧾 Balance: `{balance_str}`\n\n"
+        )
+
+    navigation = []
+    if has_prev:
+        navigation.append(
+            Button.inline(
+                "⬅️ Newer", data=history_button_data("p", user_id, rows[0], username)
+            )
+        )
+    if has_next:
+        navigation.append(
+            Button.inline(
+                "Older ➡️", data=history_button_data("n", user_id, rows[-1], username)
+            )
+        )
+    return response, [navigation] if navigation else None
+
+
+async def send_payment_history_csv(event, username, user_id):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, f"payment_history_{username}.csv")
+        # Written row by row from the cursor, never held in memory.
+        await db.read(write_history_csv, user_id, path)
+        await client.send_file(
+            event.chat_id, path, caption=f"💳 Payment history for `{username}`"
+        )
+
+
+@client.on(events.NewMessage(pattern="/payment_history"))
+@authorized_user
+async def payment_history(event):
+
+    args = event.message.text.split()
+    if len(args) < 2:
+        await event.respond("❓ Usage: /payment_history <username> [csv]")
+        return
+
+    username = args[1]
+    user_id = await user_keys.user_id(username)
+    if user_id is None:
+        await event.respond(f"❌ User `{username}` not found.")
+        return
+
+    if len(args) > 2 and args[2].lower() == "csv":
+        await send_payment_history_csv(event, username, user_id)
+        return
+
+    response, buttons = await render_payment_history(username, user_id)
+    await event.respond(response, buttons=buttons)
+
+
+# /balance command
+@client.on(events.NewMessage(pattern="/balance"))
+@authorized_user
+async def show_balance(event):
+
+    args = event.message.text.split()
+    if len(args) < 2:
+        await event.respond("❓ Usage: /balance <username>")
+        return
+
+    username = args[1]
+    user_id = await user_keys.user_id(username)
+    if user_id is None:
+        await event.respond(f"❌ User `{username}` not found.")
+        return
+
+    balances = await db.fetchall(BALANCE_QUERY, (user_id,), reader=True)
+    if not balances:
+        await event.respond(f"🔍 No payments recorded for `{username}`.")
+        return
+
+    response = f"🧾 Balance for `{username}`:\n\n"
+    for currency, balance, entries, updated_at in balances:
+        response += (
+            f"💰 `{balance:.2f} {currency}` over {entries} entries\n"
+            f"📅 Last entry: `{get_date_str(updated_at)}`\n\n"
+        )
+    await event.respond(response)
+
+
+# Function to generate the PDF report
+async def render_in_pool(status, func, *args):
+    """
+    Run ``func(*args)`` in the report worker pool, editing ``status`` with a
+    "still rendering" note while it runs. Rendering takes seconds of CPU, so
+    the bot keeps serving other commands meanwhile.
+    """
+    loop = asyncio.get_running_loop()
+    render = loop.run_in_executor(report_pool, func, *args)
+    started = time.monotonic()
+    while not render.done():
+        await asyncio.wait({render}, timeout=REPORT_PROGRESS_INTERVAL)
+        if not render.done():
+            await status.edit(
+                f"📄 Still rendering the report... ({int(time.monotonic() - started)}s)"
+            )
+    return render.result()
+
+
+def _stream_report(cursor, render, path):
+    render(cursor.execute(PAYMENTS_REPORT_QUERY), path)
+
+
+async def generate_report(event, name):
+    report_format = REPORT_FORMATS[name]
+    status = await event.respond(f"📄 Generating {name} report...")
+
+    async def render(path):
+        if report_format.streamed:
+            # Written row by row from the cursor, never held in memory.
+            await db.read(_stream_report, report_format.render, path)
+            return
+        rows = await db.fetchall(PAYMENTS_REPORT_QUERY, reader=True)
+        await render_in_pool(status, report_format.render, rows, path)
+
+    try:
+        # Read the version before querying: a write racing the query can only
+        # make this entry miss later, never serve stale data.
+        report_path = await report_cache.get(
+            (name, db.data_version), report_format.filename, render
+        )
+        await client.send_file(event.chat_id, report_path)
+    except Exception as e:
+        # The cache has already removed the partial file.
+        print(f"Warning: {name} report failed: {e!r}")
+        await status.edit(f"❌ Could not generate the {name} report: {e}")
+        return
+    await status.delete()
+
+
+# /generate_report command
+@client.on(events.NewMessage(pattern="/gen_report"))
+@authorized_user
+async def generate_report_command(event):
+    args = event.message.text.split()
+    name = args[1].lower() if len(args) > 1 else DEFAULT_REPORT_FORMAT
+    if name not in REPORT_FORMATS:
+        await event.respond(
+            f"❓ Usage: /gen_report [{'|'.join(REPORT_FORMATS)}]\n"
+            "`pdf`: styled PDF (default), `fpdf`: fast plain PDF for many users, "
+            "`html`: styled HTML page, `csv`: spreadsheet export"
+        )
+        return
+    await generate_report(event, name)
+
+
+# /list_users command
+def format_rental_entry(row, now):
+    username, tg_user_id, tg_user_first_name, expiry_time, plan_duration_sec, is_expired, _ = row
+    expiry_date_str = get_date_str(expiry_time)
+
+    if not is_expired:
+        remaining_time_str = format_time_delta(expiry_time - now)
+
+        if tg_user_id and tg_user_first_name:
+            tg_tag = f"[{tg_user_first_name}](tg://user?id={tg_user_id})"
+        else:
+            tg_tag = tg_user_first_name if tg_user_first_name else "Not set"
+
+        return (
+            f"✨ Username: `{username}`\n"
+            f"   Telegram: {tg_tag}\n"
+            f"   Plan: {parse_duration_to_human_readable(plan_duration_sec)}\n"
+            f"   Expiry Date: `{expiry_date_str}`\n"
+            f"   Remaining Time: `{remaining_time_str}`\n"
+            f"   Status: `Active`\n\n"
+        )
+
+    elased_time_str = format_time_delta(now - expiry_time)
+    return (
+        f"❌ Username: `{username}`\n"
+        f"   Telegram: [{tg_user_first_name}](tg://user?id={tg_user_id})\n"
+        f"   Expiry Date: `{expiry_date_str}`\n"
+        f"   Elapsed Time: `{elased_time_str}`\n"
+        f"   Status: `Expired`\n\n"
+    )
+
+
+async def render_user_list(view, direction=None, after=None):
+    """
+    Build the text and navigation buttons for one page of /list_users.
+    """
+    now = int(time.time())
+    rows, has_prev, has_next, counts = await db.read(
+        fetch_page, view, now, direction, after
+    )
+    total, active, expired, expiring = counts
+    window_str = parse_duration_to_human_readable(view.window).rstrip(", ")
+
+    response = (
+        f"👥 Total Users: {total}\n"
+        f"✅ Active: {active} | ❌ Expired: {expired} | ⏰ Expiring within {window_str}: {expiring}\n"
+        f"🔍 Showing: `{FILTERS[view.filter][0]}`, sorted by `{SORTS[view.sort][0]}`\n\n"
+    )
+    if not rows:
+        return response + "🔍 No users found.", None
+
+    response += "".join(format_rental_entry(row, now) for row in rows)
+    navigation = []
+    if has_prev:
+        navigation.append(Button.inline("⬅️ Prev", data=view.button_data("p", rows[0])))
+    if has_next:
+        navigation.append(Button.inline("Next ➡️", data=view.button_data("n", rows[-1])))
+    return response, [navigation] if navigation else None
+
+
+@client.on(events.NewMessage(pattern="/list_users"))
+@authorized_user
+async def list_users(event):
+    view = ListView()
+    args = event.message.text.split()[1:]
+    while args:
+        arg = args.pop(0).lower()
+        if arg in FILTER_CODES:
+            view.filter = FILTER_CODES[arg]
+            if arg == "expiring" and args and args[0].lower() not in SORT_CODES:
+                try:
+                    window = parse_duration(args[0])
+                except ValueError as e:
+                    await event.respond(f"❌ {e}")
+                    return
+                if window > 0:
+                    view.window = window
+                    args.pop(0)
+        elif arg in SORT_CODES:
+            view.sort = SORT_CODES[arg]
+        else:
+            await event.respond(
+                "❓ Usage: /list_users [all|active|expired|expiring <duration>] [expiry|name]\n"
+                "For example: `/list_users expiring 3d name`"
+            )
+            return
+
+    response, buttons = await render_user_list(view)
+    await event.respond(response, buttons=buttons)
+
+
+# /broadcast command
+@client.on(events.NewMessage(pattern="/broadcast"))
+@authorized_user
+async def broadcast(event):
+
+    if len(event.message.text.split()) < 2:
+        await event.respond("❓ Usage: /broadcast <message>")
+        return
+
+    message = event.message.text.split(" ", 1)[1]
+
+    # Prepend the message with the sender's name, along with the notice
+    message = f"📢 **Broadcast Message**\n\n{message}"
+
+    users = await db.fetchall(BROADCAST_RECIPIENTS_QUERY)
+
+    fanout = make_fanout(lambda chat_id: message)
+    recipients = [user_id for (user_id,) in users]
+    progress = await event.respond(
+        f"📢 Broadcasting to {len(set(recipients))} user(s)..."
+    )
+
+    async def report_progress(result):
+        try:
+            await progress.edit(
+                f"📢 Broadcasting... {result.done}/{result.total}\n"
+                f"✅ Sent: {result.sent} | ❌ Failed: {result.failed} | 🚫 Blocked: {result.blocked}"
+            )
+        except Exception:
+            pass
+
+    result = await fanout.run(recipients, on_progress=report_progress)
+
+    await progress.edit(
+        f"✅ Broadcasted message to {result.total} user(s).\n"
+        f"✅ Sent: {result.sent} | ❌ Failed: {result.failed} | 🚫 Blocked: {result.blocked}"
+    )
+
+
+# /clear_user command
+@client.on(events.NewMessage(pattern="/unlink_user"))
+@authorized_user
+async def clear_user(event):
+
+    if len(event.message.text.split()) < 2:
+        await event.respond("❓ Usage: /unlink_user <username>")
+        return
+
+    username = event.message.text.split()[1]
+    user_id = await user_keys.user_id(username)
+    if user_id is not None:
+        await db.execute("DELETE FROM telegram_users WHERE user_id = ?", (user_id,))
+    user_keys.invalidate(username)
+
+    await event.respond(
+        f"✅ Cleared Telegram username and user id for user `{username}`."
+    )
+
+
+# Link a Telegram user to a system user
+# Create a button to link the user
+# the user clicks the button and the bot sends the user's Telegram ID to the server
+@client.on(events.NewMessage(pattern="/link_user"))
+@authorized_user
+async def link_user(event):
+
+    if len(event.message.text.split()) < 2:
+        await event.respond("❓ Usage: /link_user <username>")
+        return
+
+    BOT_USERNAME = await client.get_me()
+
+    username = event.message.text.split()[1]
+
+    user_id = await user_keys.user_id(username)
+
+    if user_id is None:
+        await event.respond(f"❌ User `{username}` not found.")
+        return
+
+    result = await db.fetchone(LINKED_TELEGRAM_USER_QUERY, (user_id,))
+
+    tg_user_id = result[0] if result else None
+    if tg_user_id:
+        await event.respond(
+            f"❌ User `{username}` is already linked to a Telegram user."
+        )
+        return
+
+    # Get uuid for the user
+    result = await db.fetchone("SELECT uuid FROM users WHERE user_id=?", (user_id,))
+
+    unique_id = result[0]
+
+    if not unique_id:
+        await event.respond(
+            f"❌ User `{username}` doesn't have a valid UUID, randomizing..."
+        )
+        unique_id = str(uuid.uuid4())
+        await db.execute(
+            "UPDATE users SET uuid=? WHERE user_id=?", (unique_id, user_id)
+        )
+
+    await event.respond(
+        f"🔗 Click the button below to link the Telegram user to the system user `{username}`.",
+        buttons=[
+            Button.url(
+                "Link User", f"https://t.me/{BOT_USERNAME.username}?start={unique_id}"
+            )
+        ],
+    )
+
+
+# /who command
+@client.on(events.NewMessage(pattern="/who"))
+@authorized_user
+async def list_connected_users(event):
+
+    await send_connected_users(event)
+
+
+# /run command (For running a shell command)
+@client.on(events.NewMessage(pattern="/run"))
+@authorized_user
+async def run_command(event):
+
+    if len(event.message.text.split()) < 2:
+        await event.respond("❓ Usage: /run <command>")
+        return
+
+    command = event.message.text.split(" ", 1)[1]
+
+    try:
+        output = subprocess.run(
+            command, shell=True, check=True, capture_output=True, text=True
+        ).stdout
+    except subprocess.CalledProcessError as e:
+        output = e.stderr
+
+    await event.respond(f"```\n{output}\n```")
+
+
+async def send_connected_users(event):
+    snapshot = await session_monitor.snapshot()
+    response = snapshot.summary(time.time())
+    buttons = [Button.inline("Refresh", data="refresh_connected_users")]
+
+    if isinstance(event, events.CallbackQuery.Event):
+        try:
+            await event.edit(response, buttons=buttons)
+        except MessageNotModifiedError:
+            await event.answer("Already up to date.")
+    else:
+        await event.respond(response, buttons=buttons)
+
+
+@client.on(events.CallbackQuery(data="refresh_connected_users"))
+async def refresh_connected_users(event):
+    if not is_authorized_user(event.sender_id):
+        await event.answer("❌ You are not authorized to use this command.")
+        return
+    await send_connected_users(event)
+
+
+# /start command
+@client.on(events.NewMessage(pattern="/start"))
+async def start_command(event):
+    if len(event.message.text.split()) <= 1:
+        return
+
+    user_uuid = event.message.text.split()[1]
+
+    # Does the uuid exist in the database?
+    user = await db.fetchone(
+        "SELECT user_id, linux_username, linux_password FROM users WHERE uuid=?",
+        (user_uuid,),
+    )
+    if not user:
+        await event.respond("❌ Invalid or expired link.")
+        return
+    user_id, username, password = user
+    print("Username:", username)
+
+    # Get the existing user_id for the user
+    result = await db.fetchone(LINKED_TELEGRAM_USER_QUERY, (user_id,))
+    fetched_user_id = result[0] if result else None
+
+    tg_user_id = event.sender_id
+    new_tg_username = event.sender.username
+    user_first_name = event.sender.first_name
+    user_last_name = event.sender.last_name
+
+    if fetched_user_id is None:
+        if new_tg_username is None:
+            new_tg_username = tg_user_id
+
+        def _link_telegram_user(cursor):
+            cursor.execute(
+                "INSERT OR IGNORE INTO telegram_users (tg_user_id, user_id, tg_username, tg_first_name, tg_last_name) VALUES (?, ?, ?, ?, ?)",
+                (
+                    tg_user_id,
+                    user_id,
+                    new_tg_username,
+                    user_first_name,
+                    user_last_name,
+                ),
+            )
+
+            # Update users table as well
+            cursor.execute(
+                """UPDATE rentals
+                SET telegram_id = (
+                    SELECT tg_user_id
+                    FROM telegram_users
+                    WHERE user_id = ?
+                )
+                WHERE user_id = ?;
+                """,
+                (user_id, user_id),
+            )
+
+        await db.transaction(_link_telegram_user)
+
+        # Tag the user for future refs
+        msg = f"[{user_first_name}](tg://user?id={tg_user_id})\n\n"
+
+        await event.respond(
+            msg + f"🔑 **Username:** `{username}`\n🔒 **Password:** `{password}`"
+        )
+        await client.send_message(
+            ADMIN_ID,
+            f"🔑 Password sent to user [{user_first_name}](tg://user?id={tg_user_id}).",
+        )
+    else:
+        # Tag the user for future refs
+        msg = f"[{user_first_name}](tg://user?id={tg_user_id})\n\n"
+
+        if fetched_user_id == tg_user_id:
+            await event.respond(
+                msg + f"🔑 **Username:** `{username}`\n🔒 **Password:** `{password}`"
+            )
+        else:
+            await event.respond(
+                "❌ You are not authorized to get the password for this user."
+            )
+
+
+# --- Background Tasks ---
+async def notify_expiry():
+    rows = await db.fetchall(
+        """SELECT rental_id, end_time, sent_expiry_notification, is_expired, is_active
+        FROM rentals""",
+        reader=True,
+    )
+    for row in rows:
+        expiry_scheduler.update(*row)
+
+    while True:
+        # Sleep until the next warning/expiry deadline (or until a plan
+        # change re-keys the scheduler) instead of polling every minute.
+        if not await expiry_scheduler.wait_due():
+            continue
+
+        # Flag everything that is due in one transaction; messages only go
+        # out once it has committed.
+        expiring_users, expired_users = await db.transaction(
+            claim_expiry_notifications, int(time.time()), WARNING_WINDOW
+        )
+
+        for rental_id, user_id, user_first_name, username, expiry_time in expiring_users:
+            remaining_time_str = format_time_delta(expiry_time - time.time())
+
+            if user_id:
+                message = f"⏰ [{user_first_name}](tg://user?id={user_id}) Your plan for user `{username}` will expire in {remaining_time_str}."
+            else:
+                message = f"⏰ Plan for user `{username}` will expire in {remaining_time_str}."
+            message += "\n\nPlease contact the admin if you want to extend the plan. 🔄"
+            message += "\nYour data will be deleted after the expiry time. 🗑️"
+
+            if user_id:
+                # Send the message to that user_id in DM and alert the admin
+                outbox.to_user(user_id, message)
+                outbox.to_admin(
+                    f"⏰ Plan for user `{username}` will expire in {remaining_time_str}."
+                )
+            else:
+                outbox.to_admin(message)
+
+        # Rotate all expired users' passwords in one batch
+        new_passwords, rotation_failures = await rotate_passwords(
+            [username for _, _, username in expired_users]
+        )
+
+        # Notify the expired users and ask the admin to take necessary action
+        for rental_id, tg_user_id, username in expired_users:
+            message = f"❌ Your plan for the user: `{username}` has been expired."
+            message += "\n\nThanks for using our service. 🙏"
+            message += "\nFeel free to contact the admin for any queries. 📞"
+
+            if username in new_passwords:
+                new_password = new_passwords[username]
+            else:
+                new_password = (
+                    f"not changed ({rotation_failures.get(username, 'unknown error')})"
+                )
+
+            # Remove the authorized ssh keys
+            status, removal_str = await remove_ssh_auth_keys(username)
+
+            # Send the message to the user in DM
+            if tg_user_id:
+                outbox.to_user(tg_user_id, message)
+
+            # Send action notification to the admin
+            outbox.to_admin(
+                f"⚠️ Plan for user `{username}` has expired. Please take necessary action.\n"
+                f"🔑 New password for user `{username}`: `{new_password}`\n"
+                f"🔑 {removal_str}",
+                buttons=[
+                    [
+                        Button.inline(f"Cancel {username}", data=f"cancel {username}"),
+                        Button.inline(
+                            f"Delete {username}", data=f"delete_user {username}"
+                        ),
+                    ],
+                ],
+            )
+
+        # Admin messages from this tick go out as one digest
+        await outbox.flush()
+
+
+async def periodic_sync():
+    """
+    Run the reconciler every SYNC_INTERVAL seconds and report new drift to
+    the admin, applying it as well when SYNC_APPLY is set.
+    """
+    last_report = None
+    while True:
+        await asyncio.sleep(SYNC_INTERVAL)
+        try:
+            plan = await reconciler.plan()
+        except Exception as e:
+            print(f"Warning: periodic sync failed: {e}")
+            continue
+
+        report = plan.summary()
+        if SYNC_APPLY and plan.actionable:
+            result = await reconciler.apply(plan)
+            outbox.to_admin(f"🔄 **Scheduled sync**\n\n{report}\n\n{result.summary()}")
+        elif not plan.empty and report != last_report:
+            # Unchanged drift is only reported once.
+            buttons = [[Button.inline("✅ Apply", data="sync_apply")]] if plan.actionable else None
+            outbox.to_admin(f"🔄 **Scheduled sync**\n\n{report}", buttons=buttons)
+        last_report = report
+        await outbox.flush()
+
+
+# --- Callback Query Handlers ---
+@client.on(events.CallbackQuery(pattern=re.compile(r"cancel")))
+async def handle_cancel(event):
+    username = event.data.decode().split()[1]
+    user_id = await user_keys.user_id(username)
+    await db.execute(
+        "UPDATE rentals SET is_expired=1 WHERE (user_id = ? AND is_expired=0)",
+        (user_id,),
+    )
+    await reschedule_expiry(user_id)
+
+    # The prompt may be part of a digest covering other users, so reply
+    # instead of editing it.
+    await event.answer("🚫 Action canceled.")
+    await event.respond(f"🚫 Action canceled for user `{username}`.")
+
+
+@client.on(events.CallbackQuery(pattern=re.compile(r"delete_user")))
+async def handle_delete_user(event):
+    username = event.data.decode().split()[1]
+    await delete_system_user(username, event)
+
+
+@client.on(events.CallbackQuery(pattern=re.compile(r"clean_db")))
+async def handle_clean_db(event):
+    username = event.data.decode().split()[1]
+    # cursor.execute("DELETE FROM users WHERE username=?", (username,))
+    user_id = await user_keys.user_id(username)
+    if user_id is None:
+        await event.edit(f"❌ User `{username}` not found in the database.")
+        return
+    await db.execute("UPDATE rentals SET is_active=1 WHERE user_id = ?", (user_id,))
+    await reschedule_expiry(user_id)
+    result = await db.fetchone(
+        "SELECT is_expired FROM rentals WHERE user_id = ?", (user_id,)
+    )
+    is_expired = result[0]
+    status = "Expired" if is_expired else "Active"
+    await event.edit(
+        f"✅ User `{username}` plan updated in the database. Status: `{status}`."
+    )
+
+
+@client.on(events.CallbackQuery(pattern=re.compile(r"sync_apply")))
+async def handle_sync_apply(event):
+    if not is_authorized_user(event.sender_id):
+        await event.answer("❌ You are not authorized to use this command.")
+        return
+
+    # Recompute the plan: the report the button belongs to may be stale.
+    plan = await reconciler.plan()
+    if not plan.actionable:
+        await event.edit(plan.summary())
+        return
+    await event.edit("🔄 Applying changes...")
+    result = await reconciler.apply(plan)
+    await event.edit(plan.summary() + "\n\n" + result.summary())
+
+
+@client.on(events.CallbackQuery(pattern=re.compile(r"lu\|")))
+async def handle_list_users_page(event):
+    if not is_authorized_user(event.sender_id):
+        await event.answer("❌ You are not authorized to use this command.")
+        return
+
+    view, direction, after = ListView.from_button_data(event.data.decode())
+    response, buttons = await render_user_list(view, direction, after)
+    await event.edit(response, buttons=buttons)
+
+
+@client.on(events.CallbackQuery(pattern=re.compile(r"ph\|")))
+async def handle_payment_history_page(event):
+    if not is_authorized_user(event.sender_id):
+        await event.answer("❌ You are not authorized to use this command.")
+        return
+
+    direction, user_id, after, username = parse_history_button_data(
+        event.data.decode()
+    )
+    response, buttons = await render_payment_history(
+        username, user_id, direction, after
+    )
+    await event.edit(response, buttons=buttons)
+
+
+@client.on(events.CallbackQuery(pattern=re.compile(r"tglink")))
+async def handle_tglink(event):
+    username = event.data.decode().split()[1]
+
+    # Get the user_id from the event
+    user_id = event.sender_id
+    user_first_name = event.sender.first_name
+    user_last_name = event.sender.last_name
+    tg_username = event.sender.username
+
+    # Update the user's Telegram ID in the database
+    await db.execute(
+        """UPDATE telegram_users SET tg_user_id=?, tg_first_name=?, tg_last_name=? 
+        WHERE user_id = ?""",
+        (user_id, user_first_name, user_last_name, await user_keys.user_id(username)),
+    )
+
+    # Tag the user for future refs
+    msg = f"[{user_first_name}](tg://user?id={user_id})\n\n"
+    await event.edit(
+        msg + f"✅ User `{username}` linked to Telegram user `{tg_username}`."
+    )
+
+
+# --- Main Execution ---
+async def main():
+    await client.start()
+    try:
+        await client.run_until_disconnected()
+    finally:
+        await exchange_rates.close()
+        report_pool.shutdown(wait=False, cancel_futures=True)
+
+
+def run():
+    loop = asyncio.get_event_loop()
+    loop.create_task(notify_expiry())
+    if SYNC_INTERVAL > 0:
+        loop.create_task(periodic_sync())
+    loop.run_until_complete(main())
@@ -30,6 +30,35 @@ check_env()
 
 TIME_ZONE = "Asia/Kolkata"
 
+PASSWD_PATH = os.getenv("PASSWD_PATH", "/etc/passwd")
+
+# /who reads login sessions from this utmp file and reuses them for
+# WHO_CACHE_TTL seconds.
+UTMP_PATH = os.getenv("UTMP_PATH", "/var/run/utmp")
+WHO_CACHE_TTL = int(os.getenv("WHO_CACHE_TTL", 5))
+
+EXCHANGE_RATE_URL = os.getenv(
+    "EXCHANGE_RATE_URL", "https://api.exchangerate-api.com/v4/latest/{base}"
+)
+EXCHANGE_RATE_TTL = int(os.getenv("EXCHANGE_RATE_TTL", 3600))
+
+# Worker processes used to render /gen_report PDFs.
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", 2))
+# Rendered reports are cached on disk until the data changes.
+REPORT_CACHE_DIR = os.getenv("REPORT_CACHE_DIR", "report_cache")
+REPORT_CACHE_MAX_MB = int(os.getenv("REPORT_CACHE_MAX_MB", 50))
+
+# /sync_db reconciliation: seconds between automatic runs (0 disables them),
+# whether automatic runs also apply the fixes, the UID range used for rental
+# accounts and accounts that are never reported as orphaned.
+SYNC_INTERVAL = int(os.getenv("SYNC_INTERVAL", 0))
+SYNC_APPLY = os.getenv("SYNC_APPLY", "false").lower() in ("1", "true", "yes")
+RENTAL_UID_MIN = int(os.getenv("RENTAL_UID_MIN", 1000))
+RENTAL_UID_MAX = int(os.getenv("RENTAL_UID_MAX", 60000))
+SYNC_IGNORE_USERS = [
+    name.strip() for name in os.getenv("SYNC_IGNORE_USERS", "").split(",") if name.strip()
+]
+
 # Take data from the notes.txt file
 try:
     BE_NOTED_TEXT = open("notes.txt", "r").read()
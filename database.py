@@ -0,0 +1,190 @@
+import asyncio
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Database:
+    """
+    Async access layer for the bot's SQLite database.
+
+    Writes (and reads that must see them) run on one serialized writer
+    connection on a dedicated thread, so a slow query or a commit waiting on
+    fsync never stalls the Telegram event loop. The database is switched to
+    WAL journaling, which lets a small pool of read-only connections serve
+    the heavy read paths concurrently with the writer.
+
+    ``data_version`` counts committed writes that changed at least one row;
+    callers can use it to tell whether cached query results are stale.
+    """
+
+    def __init__(self, path, readers=4, synchronous="NORMAL"):
+        self.path = path
+        self.synchronous = synchronous
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="db-writer"
+        )
+        self._conn = self._executor.submit(self._connect).result()
+        self.data_version = 0
+        self._total_changes = 0
+
+        # An in-memory database is private to its connection, so there is
+        # nothing for a reader pool to share.
+        if path == ":memory:":
+            readers = 0
+        self._local = threading.local()
+        self._reader_conns = []
+        self._reader_executor = (
+            ThreadPoolExecutor(max_workers=readers, thread_name_prefix="db-reader")
+            if readers
+            else None
+        )
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+        conn.execute("PRAGMA busy_timeout = 5000")
+        return conn
+
+    def _reader(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                f"file:{self.path}?mode=ro", uri=True, check_same_thread=False
+            )
+            conn.execute("PRAGMA query_only = ON")
+            conn.execute("PRAGMA busy_timeout = 5000")
+            self._local.conn = conn
+            self._reader_conns.append(conn)
+        return conn
+
+    # --- Blocking helpers (run on the database thread) ---
+    def _committed(self):
+        # Bumped after the commit, so a reader that sees the old version can
+        # only have read data at least as new as it.
+        total_changes = self._conn.total_changes
+        if total_changes != self._total_changes:
+            self._total_changes = total_changes
+            self.data_version += 1
+
+    def _execute(self, sql, params):
+        with self._conn:
+            cursor = self._conn.execute(sql, params)
+        self._committed()
+        return cursor.rowcount
+
+    def _executemany(self, sql, seq_of_params):
+        with self._conn:
+            cursor = self._conn.executemany(sql, seq_of_params)
+        self._committed()
+        return cursor.rowcount
+
+    def _fetchone(self, sql, params):
+        return self._conn.execute(sql, params).fetchone()
+
+    def _fetchall(self, sql, params):
+        return self._conn.execute(sql, params).fetchall()
+
+    def _read_fetchone(self, sql, params):
+        return self._reader().execute(sql, params).fetchone()
+
+    def _read_fetchall(self, sql, params):
+        return self._reader().execute(sql, params).fetchall()
+
+    def _read(self, func, args):
+        return func(self._reader().cursor(), *args)
+
+    def _explain(self, sql, params):
+        rows = self._conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+        return [row[-1] for row in rows]
+
+    def _transaction(self, func, args):
+        try:
+            with self._conn:
+                return func(self._conn.cursor(), *args)
+        finally:
+            self._committed()
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def _run_reader(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._reader_executor, func, *args)
+
+    # --- Public API ---
+    def execute_sync(self, sql, params=()):
+        """
+        Run and commit a statement from synchronous code (startup only).
+        """
+        return self._executor.submit(self._execute, sql, params).result()
+
+    def explain_sync(self, sql, params=()):
+        """
+        Return the ``EXPLAIN QUERY PLAN`` detail lines for a statement.
+        """
+        return self._executor.submit(self._explain, sql, params).result()
+
+    def transaction_sync(self, func, *args):
+        """
+        Run ``func(cursor, *args)`` in a transaction from synchronous code
+        (startup only); see ``transaction``.
+        """
+        return self._executor.submit(self._transaction, func, args).result()
+
+    async def execute(self, sql, params=()):
+        """
+        Run and commit a single write statement, returning the row count.
+        """
+        return await self._run(self._execute, sql, params)
+
+    async def executemany(self, sql, seq_of_params):
+        """
+        Run and commit a statement once per parameter set.
+        """
+        return await self._run(self._executemany, sql, list(seq_of_params))
+
+    async def fetchone(self, sql, params=(), reader=False):
+        """
+        Fetch one row. With ``reader=True`` the query runs on the read-only
+        pool; it sees every committed write but not the writer's open work.
+        """
+        if reader and self._reader_executor:
+            return await self._run_reader(self._read_fetchone, sql, params)
+        return await self._run(self._fetchone, sql, params)
+
+    async def fetchall(self, sql, params=(), reader=False):
+        """
+        Fetch all rows, optionally from the read-only pool (see fetchone).
+        """
+        if reader and self._reader_executor:
+            return await self._run_reader(self._read_fetchall, sql, params)
+        return await self._run(self._fetchall, sql, params)
+
+    async def read(self, func, *args):
+        """
+        Run ``func(cursor, *args)`` on a read-only pool connection and
+        return its result. Useful to stream a large result set into a file
+        without materialising it; ``func`` must not write.
+        """
+        if self._reader_executor:
+            return await self._run_reader(self._read, func, args)
+        return await self._run(self._transaction, func, args)
+
+    async def transaction(self, func, *args):
+        """
+        Run ``func(cursor, *args)`` on the database thread inside a single
+        transaction. It is committed if ``func`` returns and rolled back if
+        it raises; the return value of ``func`` is passed back to the caller.
+        """
+        return await self._run(self._transaction, func, args)
+
+    def close(self):
+        if self._reader_executor:
+            self._reader_executor.shutdown()
+            for conn in self._reader_conns:
+                conn.close()
+        self._executor.submit(self._conn.close).result()
+        self._executor.shutdown()
@@ -0,0 +1,183 @@
+"""
+Earnings summaries kept up to date by SQLite triggers on ``payments``.
+
+Every new payment adjusts one row in ``earnings_daily`` and one in
+``earnings_monthly``, in the same transaction as the payment itself, so ``/earnings`` reads at most a few dozen summary
+rows instead of summing the whole payments table. Buckets are calendar days
+and months in the bot's time zone, at the UTC offset it had when the
+triggers were installed; ``rebuild`` recomputes both tables from
+``payments`` if they ever drift (or the offset changes).
+"""
+
+import calendar
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+SUMMARY_TABLES = (
+    """CREATE TABLE IF NOT EXISTS earnings_daily (
+        day TEXT PRIMARY KEY, -- YYYY-MM-DD
+        total REAL NOT NULL,
+        payments INTEGER NOT NULL
+    ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS earnings_monthly (
+        month TEXT PRIMARY KEY, -- YYYY-MM
+        total REAL NOT NULL,
+        payments INTEGER NOT NULL
+    ) WITHOUT ROWID""",
+)
+
+_DAY = "date({row}.payment_date, 'unixepoch', '{offset:+d} minutes')"
+_MONTH = "strftime('%Y-%m', {row}.payment_date, 'unixepoch', '{offset:+d} minutes')"
+
+# Add ``sign`` times the {row} payment to its day and month.
+_APPLY = """
+    INSERT INTO earnings_daily (day, total, payments)
+    VALUES ({day}, {sign}{row}.amount, {sign}1)
+    ON CONFLICT(day) DO UPDATE SET
+        total = total + excluded.total, payments = payments + excluded.payments;
+    INSERT INTO earnings_monthly (month, total, payments)
+    VALUES ({month}, {sign}{row}.amount, {sign}1)
+    ON CONFLICT(month) DO UPDATE SET
+        total = total + excluded.total, payments = payments + excluded.payments;
+"""
+
+# Only inserts: the ledger triggers make payments append-only, so an
+# update or delete never gets this far.
+_TRIGGERS = {
+    "earnings_payment_insert": ("AFTER INSERT ON payments", (("NEW", "+"),)),
+}
+# Installed by earlier versions for updates and deletes.
+_OBSOLETE_TRIGGERS = ("earnings_payment_delete", "earnings_payment_update")
+
+
+def _apply(row, sign, offset):
+    return _APPLY.format(
+        day=_DAY.format(row=row, offset=offset),
+        month=_MONTH.format(row=row, offset=offset),
+        row=row,
+        sign=sign,
+    )
+
+
+def trigger_statements(offset_minutes):
+    """
+    SQL that (re)installs the summary triggers for a UTC offset; run it on
+    every start so a changed TIME_ZONE takes effect.
+    """
+    statements = [f"DROP TRIGGER IF EXISTS {name}" for name in _OBSOLETE_TRIGGERS]
+    for name, (event, changes) in _TRIGGERS.items():
+        body = "".join(_apply(row, sign, offset_minutes) for row, sign in changes)
+        statements.append(f"DROP TRIGGER IF EXISTS {name}")
+        statements.append(f"CREATE TRIGGER {name} {event} BEGIN {body} END")
+    return statements
+
+
+def rebuild(cursor, offset_minutes):
+    """
+    Recompute both summary tables from ``payments``; meant for
+    ``Database.transaction``. Returns the all-time ``(total, payments)``
+    before and after, so callers can tell whether anything had drifted.
+    """
+    before = cursor.execute(ALL_TIME_QUERY).fetchone()
+    cursor.execute("DELETE FROM earnings_daily")
+    cursor.execute("DELETE FROM earnings_monthly")
+    cursor.execute(
+        f"""INSERT INTO earnings_daily (day, total, payments)
+        SELECT {_DAY.format(row='payments', offset=offset_minutes)}, SUM(amount), COUNT(*)
+        FROM payments GROUP BY 1"""
+    )
+    cursor.execute(
+        """INSERT INTO earnings_monthly (month, total, payments)
+        SELECT substr(day, 1, 7), SUM(total), SUM(payments)
+        FROM earnings_daily GROUP BY 1"""
+    )
+    return before, cursor.execute(ALL_TIME_QUERY).fetchone()
+
+
+def needs_backfill(cursor):
+    """
+    True when the summaries are empty but payments exist, i.e. on the first
+    start after the triggers were added.
+    """
+    summarized = cursor.execute("SELECT 1 FROM earnings_monthly LIMIT 1").fetchone()
+    paid = cursor.execute("SELECT 1 FROM payments LIMIT 1").fetchone()
+    return summarized is None and paid is not None
+
+
+ALL_TIME_QUERY = """
+    SELECT COALESCE(SUM(total), 0), COALESCE(SUM(payments), 0) FROM earnings_monthly
+    """
+DAY_RANGE_QUERY = """
+    SELECT day, total, payments FROM earnings_daily
+    WHERE day BETWEEN ? AND ? ORDER BY day
+    """
+MONTH_RANGE_QUERY = """
+    SELECT month, total, payments FROM earnings_monthly
+    WHERE month BETWEEN ? AND ? ORDER BY month
+    """
+
+
+@dataclass
+class Earnings:
+    start: date
+    end: date
+    total: float
+    payments: int
+    # (label, total, payments) per day or month, for the breakdown.
+    breakdown: list
+
+
+def _month_end(day):
+    return day.replace(day=calendar.monthrange(day.year, day.month)[1])
+
+
+def split_range(start, end):
+    """
+    Split the inclusive date range into the day spans before and after its
+    whole months, and the ``(first, last)`` whole months. Either part may be
+    empty (``[]`` / ``None``).
+    """
+    first = start if start.day == 1 else _month_end(start) + timedelta(days=1)
+    last = end if end == _month_end(end) else end.replace(day=1) - timedelta(days=1)
+    if first > last:
+        return [(start, end)], None
+    spans = []
+    if start < first:
+        spans.append((start, first - timedelta(days=1)))
+    if last < end:
+        spans.append((last + timedelta(days=1), end))
+    return spans, (first.strftime("%Y-%m"), last.strftime("%Y-%m"))
+
+
+def earnings_between(cursor, start, end, by_month=False):
+    """
+    Earnings from ``start`` to ``end`` (inclusive dates); meant for
+    ``Database.read``. Whole months are read from the monthly buckets and
+    only the ragged ends from the daily ones, so a range costs at most about
+    60 day rows plus one row per month. ``by_month`` merges the breakdown
+    into months.
+    """
+    day_spans, months = split_range(start, end)
+    rows = []
+    for first, last in day_spans:
+        rows += cursor.execute(
+            DAY_RANGE_QUERY, (first.isoformat(), last.isoformat())
+        ).fetchall()
+    if months:
+        rows += cursor.execute(MONTH_RANGE_QUERY, months).fetchall()
+    rows.sort()
+
+    breakdown = {}
+    for label, total, payments in rows:
+        if not payments:
+            continue  # emptied by deletes
+        key = label[:7] if by_month else label
+        previous_total, previous_payments = breakdown.get(key, (0, 0))
+        breakdown[key] = (previous_total + total, previous_payments + payments)
+    return Earnings(
+        start,
+        end,
+        sum(total for total, _ in breakdown.values()),
+        sum(payments for _, payments in breakdown.values()),
+        [(key, total, payments) for key, (total, payments) in breakdown.items()],
+    )
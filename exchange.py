@@ -0,0 +1,107 @@
+import asyncio
+import time
+
+import aiohttp
+
+
+class ExchangeRateUnavailable(Exception):
+    pass
+
+
+class ExchangeRates:
+    """
+    Exchange rate lookups with a TTL cache and a single shared HTTP session.
+
+    Concurrent lookups for the same base currency share one request
+    (single-flight). Every successful fetch is persisted to the
+    ``exchange_rates`` table, so after a restart, or while the API is
+    unreachable, the last known rates are still available; they are reused
+    for ``retry_interval`` seconds before the API is tried again.
+    """
+
+    def __init__(self, db, url, ttl=3600, timeout=10, retry_interval=60):
+        self.db = db
+        self.url = url
+        self.ttl = ttl
+        self.retry_interval = retry_interval
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.hits = 0
+        self.fetches = 0
+        self.fallbacks = 0
+        self._session = None
+        self._rates = {}
+        self._inflight = {}
+
+    async def _get_session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=self.timeout)
+        return self._session
+
+    async def _fetch(self, base):
+        session = await self._get_session()
+        async with session.get(self.url.format(base=base)) as response:
+            response.raise_for_status()
+            data = await response.json()
+        return data["rates"]
+
+    async def _load_persisted(self, base):
+        rows = await self.db.fetchall(
+            "SELECT quote, rate, fetched_at FROM exchange_rates WHERE base = ?",
+            (base,),
+        )
+        if not rows:
+            return None
+        return min(row[2] for row in rows), {quote: rate for quote, rate, _ in rows}
+
+    async def _refresh(self, base):
+        try:
+            rates = await self._fetch(base)
+        except Exception as e:
+            self.fallbacks += 1
+            print(f"Warning: exchange rate lookup for {base} failed: {e}")
+            cached = self._rates.get(base) or await self._load_persisted(base)
+            if cached is None:
+                raise ExchangeRateUnavailable(
+                    f"No exchange rate available for {base}."
+                ) from e
+            # Backdate the stale rates so they expire after retry_interval.
+            self._rates[base] = (time.time() - self.ttl + self.retry_interval, cached[1])
+            return cached[1]
+
+        self.fetches += 1
+        fetched_at = int(time.time())
+        self._rates[base] = (fetched_at, rates)
+        await self.db.executemany(
+            """INSERT INTO exchange_rates (base, quote, rate, fetched_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(base, quote) DO UPDATE
+            SET rate = excluded.rate, fetched_at = excluded.fetched_at""",
+            ((base, quote, rate, fetched_at) for quote, rate in rates.items()),
+        )
+        return rates
+
+    async def get_rate(self, from_currency, to_currency):
+        cached = self._rates.get(from_currency)
+        if cached and time.time() - cached[0] < self.ttl:
+            self.hits += 1
+            return cached[1][to_currency]
+
+        task = self._inflight.get(from_currency)
+        if task is None:
+            task = asyncio.ensure_future(self._refresh(from_currency))
+            self._inflight[from_currency] = task
+            task.add_done_callback(
+                lambda _: self._inflight.pop(from_currency, None)
+            )
+        rates = await asyncio.shield(task)
+        return rates[to_currency]
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+    def stats(self):
+        return (
+            f"{self.hits} cache hits, {self.fetches} fetches, "
+            f"{self.fallbacks} fallbacks to stored rates"
+        )
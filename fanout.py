@@ -0,0 +1,137 @@
+import asyncio
+import time
+from dataclasses import dataclass
+
+
+class TokenBucket:
+    """
+    Token bucket allowing ``rate`` acquisitions per second with bursts of up
+    to ``capacity``.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+@dataclass
+class FanOutResult:
+    total: int
+    sent: int = 0
+    failed: int = 0
+    blocked: int = 0
+
+    @property
+    def done(self):
+        return self.sent + self.failed + self.blocked
+
+
+class FanOut:
+    """
+    Send one message to many chats with bounded concurrency and a global
+    rate limit.
+
+    ``send(chat_id)`` performs the actual delivery. Exceptions listed in
+    ``flood_errors`` must carry a ``seconds`` attribute: every worker pauses
+    for that long and the chat is retried. Exceptions in ``blocked_errors``
+    mean the chat can never be reached and are not retried. Anything else is
+    retried with exponential backoff up to ``max_retries`` times.
+
+    The defaults (25/s plus a burst of 5) stay under Telegram's limit of
+    about 30 messages per second for bots.
+    """
+
+    def __init__(
+        self,
+        send,
+        rate=25,
+        burst=5,
+        concurrency=10,
+        max_retries=3,
+        backoff=0.5,
+        flood_errors=(),
+        blocked_errors=(),
+    ):
+        self.send = send
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.flood_errors = tuple(flood_errors)
+        self.blocked_errors = tuple(blocked_errors)
+        self._resume_at = 0.0
+
+    async def _wait_flood(self):
+        delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _deliver(self, chat_id, result):
+        attempt = 0
+        while True:
+            await self._wait_flood()
+            await self.bucket.acquire()
+            try:
+                await self.send(chat_id)
+            except self.flood_errors as e:
+                self._resume_at = max(self._resume_at, time.monotonic() + e.seconds)
+                continue
+            except self.blocked_errors:
+                result.blocked += 1
+                return
+            except Exception:
+                attempt += 1
+                if attempt > self.max_retries:
+                    result.failed += 1
+                    return
+                await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+                continue
+            result.sent += 1
+            return
+
+    async def run(self, chat_ids, on_progress=None, progress_interval=3.0):
+        """
+        Deliver to every chat and return a FanOutResult. ``on_progress`` is
+        awaited with the running result at most every ``progress_interval``
+        seconds.
+        """
+        chat_ids = list(dict.fromkeys(chat_ids))
+        result = FanOutResult(total=len(chat_ids))
+        queue = asyncio.Queue()
+        for chat_id in chat_ids:
+            queue.put_nowait(chat_id)
+
+        async def worker():
+            while not queue.empty():
+                await self._deliver(queue.get_nowait(), result)
+
+        async def reporter():
+            while True:
+                await asyncio.sleep(progress_interval)
+                await on_progress(result)
+
+        report = asyncio.create_task(reporter()) if on_progress else None
+        try:
+            await asyncio.gather(
+                *(worker() for _ in range(min(self.concurrency, len(chat_ids))))
+            )
+        finally:
+            if report:
+                report.cancel()
+        return result
@@ -0,0 +1,202 @@
+"""
+Per-user running balances over the ``payments`` ledger.
+
+``payments`` is append-only: credits are positive rows, debits negative
+ones, and corrections are new entries rather than edits. A trigger keeps
+``balances`` (one row per user and currency) current and stamps every new
+payment with the balance it leaves, in the same transaction as the insert,
+so ``/balance`` is a primary-key lookup and ``/payment_history`` can show
+the balance after each entry without summing the history.
+
+``/payment_history`` pages through a user's entries newest first by keyset
+on ``(payment_date, payment_id)`` over ``idx_payments_user_date``, so any
+page costs one short index range, and its CSV export streams the whole
+history from the cursor.
+"""
+
+import csv
+
+from timeutils import get_date_str
+
+BALANCES_TABLE = """CREATE TABLE IF NOT EXISTS balances (
+    user_id INTEGER NOT NULL,
+    currency TEXT NOT NULL,
+    balance REAL NOT NULL,
+    entries INTEGER NOT NULL,
+    updated_at INTEGER NOT NULL,
+    PRIMARY KEY (user_id, currency)
+) WITHOUT ROWID"""
+
+_TRIGGERS = {
+    "ledger_payment_insert": """AFTER INSERT ON payments BEGIN
+        INSERT INTO balances (user_id, currency, balance, entries, updated_at)
+        VALUES (NEW.user_id, NEW.currency, NEW.amount, 1, NEW.payment_date)
+        ON CONFLICT(user_id, currency) DO UPDATE SET
+            balance = balance + excluded.balance,
+            entries = entries + 1,
+            updated_at = excluded.updated_at;
+        UPDATE payments SET balance_after = (
+            SELECT balance FROM balances
+            WHERE user_id = NEW.user_id AND currency = NEW.currency
+        ) WHERE payment_id = NEW.payment_id;
+    END""",
+    "ledger_payment_no_update": """BEFORE UPDATE OF user_id, amount, currency, payment_date
+    ON payments BEGIN
+        SELECT RAISE(ABORT, 'payments are append-only; record a credit or debit instead');
+    END""",
+    "ledger_payment_no_delete": """BEFORE DELETE ON payments BEGIN
+        SELECT RAISE(ABORT, 'payments are append-only; record a credit or debit instead');
+    END""",
+}
+
+BALANCE_QUERY = """
+    SELECT currency, balance, entries, updated_at FROM balances
+    WHERE user_id = ? ORDER BY currency
+    """
+
+
+def trigger_statements():
+    statements = []
+    for name, body in _TRIGGERS.items():
+        statements.append(f"DROP TRIGGER IF EXISTS {name}")
+        statements.append(f"CREATE TRIGGER {name} {body}")
+    return statements
+
+
+def migrate(cursor):
+    """
+    Add ``payments.balance_after`` and backfill it and ``balances`` from the
+    existing rows in one ordered pass; meant for ``Database.transaction``.
+    The backfill runs while any payment lacks a balance, so a start that
+    added the column but failed to backfill is finished by the next one.
+    Returns the number of backfilled payments.
+    """
+    columns = [row[1] for row in cursor.execute("PRAGMA table_info(payments)")]
+    if "balance_after" not in columns:
+        # sqlite3 commits DDL on its own, outside the backfill's transaction.
+        cursor.execute("ALTER TABLE payments ADD COLUMN balance_after REAL")
+    if not cursor.execute(
+        "SELECT 1 FROM payments WHERE balance_after IS NULL LIMIT 1"
+    ).fetchone():
+        return 0
+
+    running = {}
+    updates = []
+    for payment_id, user_id, currency, amount, payment_date in cursor.execute(
+        """SELECT payment_id, user_id, currency, amount, payment_date
+        FROM payments ORDER BY payment_id"""
+    ).fetchall():
+        balance, entries, _ = running.get((user_id, currency), (0, 0, 0))
+        balance += amount
+        running[user_id, currency] = (balance, entries + 1, payment_date)
+        updates.append((balance, payment_id))
+
+    cursor.executemany(
+        "UPDATE payments SET balance_after = ? WHERE payment_id = ?", updates
+    )
+    cursor.execute("DELETE FROM balances")
+    cursor.executemany(
+        """INSERT INTO balances (user_id, currency, balance, entries, updated_at)
+        VALUES (?, ?, ?, ?, ?)""",
+        (key + value for key, value in running.items()),
+    )
+    return len(updates)
+
+
+HISTORY_PAGE_SIZE = 10
+
+HISTORY_COLUMNS = ("Payment ID", "Date (IST)", "Amount", "Currency", "Balance")
+
+HISTORY_QUERY = """
+    SELECT payment_id, amount, currency, payment_date, balance_after
+    FROM payments
+    WHERE user_id = ? {seek}
+    ORDER BY payment_date {order}, payment_id {order}
+    {limit}
+    """
+
+
+def history_query(direction=None, limit=True):
+    """
+    SQL for a user's entries, newest first; ``direction`` is "n" to seek
+    past an older ``(payment_date, payment_id)`` key, "p" to seek back
+    towards newer ones (returned oldest first), or None for the first page.
+    """
+    seek = ""
+    if direction == "n":
+        seek = "AND (payment_date, payment_id) < (?, ?)"
+    elif direction == "p":
+        seek = "AND (payment_date, payment_id) > (?, ?)"
+    return HISTORY_QUERY.format(
+        seek=seek,
+        order="ASC" if direction == "p" else "DESC",
+        limit="LIMIT ?" if limit else "",
+    )
+
+
+def fetch_history_page(
+    cursor, user_id, direction=None, after=None, page_size=HISTORY_PAGE_SIZE
+):
+    """
+    Fetch one page of a user's history; meant for ``Database.read``.
+    Returns ``(rows, has_prev, has_next, balances)`` with rows newest first
+    and the user's ``BALANCE_QUERY`` rows.
+    """
+    params = [user_id]
+    if direction:
+        params.extend(after)
+    params.append(page_size + 1)
+    rows = cursor.execute(history_query(direction), params).fetchall()
+
+    more = len(rows) > page_size
+    rows = rows[:page_size]
+    if direction == "p":
+        rows.reverse()
+        has_prev, has_next = more, True
+    else:
+        has_prev, has_next = direction == "n", more
+
+    balances = cursor.execute(BALANCE_QUERY, (user_id,)).fetchall()
+    return rows, has_prev, has_next, balances
+
+
+def history_button_data(direction, user_id, row, username):
+    # The username goes last because it is free text.
+    return f"ph|{direction}|{user_id}|{row[3]}|{row[0]}|{username}"
+
+
+def parse_history_button_data(data):
+    """
+    Parse callback data into ``(direction, user_id, (payment_date,
+    payment_id), username)``.
+    """
+    _, direction, user_id, payment_date, payment_id, username = data.split("|", 5)
+    return direction, int(user_id), (int(payment_date), int(payment_id)), username
+
+
+def history_records(rows):
+    """
+    Format history rows as one tuple per HISTORY_COLUMNS, lazily.
+    """
+    for payment_id, amount, currency, payment_date, balance_after in rows:
+        yield (
+            payment_id,
+            get_date_str(payment_date),
+            f"{amount:.2f}",
+            currency,
+            "-" if balance_after is None else f"{balance_after:.2f}",
+        )
+
+
+def write_history_csv(cursor, user_id, path):
+    """
+    Stream a user's full history into a CSV file at ``path`` straight from
+    the cursor, so memory stays flat however long it is; meant for
+    ``Database.read``.
+    """
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(HISTORY_COLUMNS)
+        writer.writerows(
+            history_records(cursor.execute(history_query(limit=False), (user_id,)))
+        )
@@ -0,0 +1,125 @@
+"""
+Keyset-paginated listing of live rentals for `/list_users`.
+
+A page is fetched with one indexed query that seeks past the last row shown
+(``(sort key, rental_id)``) instead of using OFFSET, so every page costs the
+same no matter how deep it is. Navigation state travels in the inline
+button data, which Telegram caps at 64 bytes.
+"""
+
+from dataclasses import dataclass
+
+PAGE_SIZE = 10
+
+# Filter code -> (label, extra WHERE clause). "expiring" binds the end of
+# its window as a parameter.
+FILTERS = {
+    "a": ("all", ""),
+    "l": ("active", "AND r.is_expired = 0"),
+    "x": ("expired", "AND r.is_expired = 1"),
+    "s": ("expiring", "AND r.is_expired = 0 AND r.end_time <= ?"),
+}
+FILTER_CODES = {label: code for code, (label, _) in FILTERS.items()}
+
+# Sort code -> (label, column)
+SORTS = {
+    "e": ("expiry", "r.end_time"),
+    "n": ("name", "u.linux_username"),
+}
+SORT_CODES = {label: code for code, (label, _) in SORTS.items()}
+
+PAGE_QUERY = """
+    SELECT u.linux_username, t.tg_user_id, t.tg_first_name, r.end_time,
+        r.plan_duration, r.is_expired, r.rental_id
+    FROM rentals r
+    JOIN users u ON r.user_id = u.user_id
+    LEFT JOIN telegram_users t ON r.telegram_id = t.tg_user_id
+    WHERE r.is_active = 1 {filter} {seek}
+    ORDER BY {column} {order}, r.rental_id {order}
+    LIMIT ?
+    """
+
+# Header counts in a single aggregate pass over the rentals table.
+SUMMARY_QUERY = """
+    SELECT
+        COUNT(*),
+        COALESCE(SUM(is_expired = 0), 0),
+        COALESCE(SUM(is_expired = 1), 0),
+        COALESCE(SUM(is_expired = 0 AND end_time <= ?), 0)
+    FROM rentals
+    WHERE is_active = 1
+    """
+
+
+@dataclass
+class ListView:
+    filter: str = "a"
+    sort: str = "e"
+    # Seconds ahead covered by the "expiring" filter and summary count.
+    window: int = 24 * 60 * 60
+
+    def page_query(self, direction=None):
+        """
+        Return the SQL for a page; ``direction`` is "n" to seek after a key,
+        "p" to seek before one, or None for the first page.
+        """
+        column = SORTS[self.sort][1]
+        seek = ""
+        if direction == "n":
+            seek = f"AND ({column}, r.rental_id) > (?, ?)"
+        elif direction == "p":
+            seek = f"AND ({column}, r.rental_id) < (?, ?)"
+        return PAGE_QUERY.format(
+            filter=FILTERS[self.filter][1],
+            seek=seek,
+            column=column,
+            order="DESC" if direction == "p" else "ASC",
+        )
+
+    def button_data(self, direction, row):
+        """
+        Callback data to page from ``row`` in ``direction``; the sort key
+        goes last because usernames may contain the separator.
+        """
+        key = row[0] if self.sort == "n" else row[3]
+        return f"lu|{self.filter}|{self.sort}|{self.window}|{direction}|{row[6]}|{key}"
+
+    @classmethod
+    def from_button_data(cls, data):
+        """
+        Parse callback data into ``(view, direction, (key, rental_id))``.
+        """
+        _, list_filter, sort, window, direction, rental_id, key = data.split("|", 6)
+        view = cls(list_filter, sort, int(window))
+        if sort == "e":
+            key = int(key)
+        return view, direction, (key, int(rental_id))
+
+
+def fetch_page(cursor, view, now, direction=None, after=None, page_size=PAGE_SIZE):
+    """
+    Fetch one page of ``view`` plus the summary counts; meant for
+    ``Database.read``.
+
+    ``after`` is the ``(key, rental_id)`` of the row to page from. Returns
+    ``(rows, has_prev, has_next, counts)`` with rows in display order and
+    counts as ``(total, active, expired, expiring)``.
+    """
+    params = []
+    if view.filter == "s":
+        params.append(now + view.window)
+    if direction:
+        params.extend(after)
+    params.append(page_size + 1)
+    rows = cursor.execute(view.page_query(direction), params).fetchall()
+
+    more = len(rows) > page_size
+    rows = rows[:page_size]
+    if direction == "p":
+        rows.reverse()
+        has_prev, has_next = more, True
+    else:
+        has_prev, has_next = direction == "n", more
+
+    counts = cursor.execute(SUMMARY_QUERY, (now + view.window,)).fetchone()
+    return rows, has_prev, has_next, counts
@@ -0,0 +1,139 @@
+"""
+Bulk tenant onboarding from an uploaded CSV or JSON file.
+
+The file lists one tenant per row/object with the fields ``username``,
+``duration`` (e.g. ``30d``), ``amount`` and ``currency`` (INR or USD).
+"""
+
+import csv
+import io
+import json
+import math
+import re
+from dataclasses import dataclass
+
+FIELDS = ("username", "duration", "amount", "currency")
+CURRENCIES = ("INR", "USD")
+
+# Same rules as useradd's default NAME_REGEX.
+USERNAME_PATTERN = re.compile(r"^[a-z_][a-z0-9_-]{0,31}$")
+
+
+@dataclass
+class Tenant:
+    username: str
+    duration_seconds: int
+    amount: float
+    currency: str
+    password: str = ""
+    uuid: str = ""
+    amount_inr: float = 0.0
+
+
+def _read_records(data, filename):
+    text = data.decode("utf-8-sig")
+    if filename.lower().endswith(".json") or text.lstrip().startswith("["):
+        records = json.loads(text)
+        if not isinstance(records, list):
+            raise ValueError("JSON file must contain a list of tenants.")
+        return [
+            (i, record if isinstance(record, dict) else {})
+            for i, record in enumerate(records, start=1)
+        ]
+    reader = csv.DictReader(io.StringIO(text))
+    missing = [field for field in FIELDS if field not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f"CSV header is missing: {', '.join(missing)}.")
+    # Line 1 is the header.
+    return [(i, record) for i, record in enumerate(reader, start=2)]
+
+
+def _field(record, name):
+    # Only a missing field is empty; a JSON 0 is a real value.
+    value = record.get(name)
+    return "" if value is None else str(value).strip()
+
+
+def parse_tenant_file(data, filename, parse_duration):
+    """
+    Parse and validate every tenant in the file.
+
+    Returns ``(tenants, errors)``; ``errors`` holds one message per invalid
+    row, and callers should reject the whole batch if it is not empty.
+    """
+    try:
+        records = _read_records(data, filename)
+    except (UnicodeDecodeError, ValueError) as e:
+        return [], [str(e)]
+
+    tenants, errors, seen = [], [], set()
+    for line, record in records:
+        username = _field(record, "username")
+        duration = _field(record, "duration")
+        amount = _field(record, "amount")
+        currency = _field(record, "currency").upper()
+
+        problems = []
+        if not USERNAME_PATTERN.match(username):
+            problems.append(f"invalid username `{username}`")
+        elif username in seen:
+            problems.append(f"duplicate username `{username}`")
+        try:
+            duration_seconds = parse_duration(duration) if duration else 0
+        except ValueError:
+            duration_seconds = 0
+        if duration_seconds <= 0:
+            problems.append(f"invalid duration `{duration}`")
+        try:
+            amount_value = float(amount)
+            if not math.isfinite(amount_value) or amount_value < 0:
+                raise ValueError
+        except ValueError:
+            problems.append(f"invalid amount `{amount}`")
+        if currency not in CURRENCIES:
+            problems.append(f"invalid currency `{currency}`")
+
+        if problems:
+            errors.append(f"Row {line}: {', '.join(problems)}")
+            continue
+        seen.add(username)
+        tenants.append(Tenant(username, duration_seconds, amount_value, currency))
+
+    if not tenants and not errors:
+        errors.append("The file does not contain any tenants.")
+    return tenants, errors
+
+
+def insert_tenants(cursor, tenants, now):
+    """
+    Insert users, rentals and payments for every tenant; meant to run in a
+    single ``Database.transaction``. Returns ``(rental_id, end_time)`` for
+    each new rental.
+    """
+    rentals = []
+    for tenant in tenants:
+        cursor.execute(
+            "INSERT INTO users (uuid, linux_username, linux_password) VALUES (?, ?, ?)",
+            (tenant.uuid, tenant.username, tenant.password),
+        )
+        user_id = cursor.lastrowid
+        end_time = now + tenant.duration_seconds
+        cursor.execute(
+            """INSERT INTO rentals (user_id, start_time, end_time, plan_duration, amount, currency)
+            VALUES (?, ?, ?, ?, ?, ?)""",
+            (
+                user_id,
+                now,
+                end_time,
+                tenant.duration_seconds,
+                tenant.amount,
+                tenant.currency,
+            ),
+        )
+        rentals.append((cursor.lastrowid, end_time))
+        cursor.execute(
+            """INSERT INTO payments (user_id, amount, currency, payment_date)
+            VALUES (?, ?, ?, ?)""",
+            (user_id, tenant.amount_inr, "INR", now),
+        )
+    return rentals
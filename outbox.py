@@ -0,0 +1,100 @@
+import asyncio
+
+from fanout import TokenBucket
+
+# Telegram's limits for a single message.
+MAX_MESSAGE_LENGTH = 4096
+MAX_BUTTONS = 100
+
+DIGEST_SEPARATOR = "\n\n➖➖➖\n\n"
+
+
+class Outbox:
+    """
+    Outbound message queue that coalesces admin notifications.
+
+    Everything queued for the admin between two flushes is merged into as
+    few digest messages as the length and inline keyboard limits allow,
+    keeping each entry's buttons. Messages for other chats are sent one by
+    one. Sends are paced by a global token bucket plus a slower one for the
+    admin chat, since Telegram also limits messages per chat. Flood errors
+    (which carry a ``seconds`` attribute) pause the queue and retry the
+    message.
+    """
+
+    def __init__(self, send, admin_id, rate=25, admin_rate=1, flood_errors=()):
+        self.send = send
+        self.admin_id = admin_id
+        self.bucket = TokenBucket(rate, 1)
+        self.admin_bucket = TokenBucket(admin_rate, 1)
+        self.flood_errors = tuple(flood_errors)
+        self._admin = []
+        self._users = []
+
+    def to_admin(self, text, buttons=None):
+        self._admin.append((text, buttons or []))
+
+    def to_user(self, chat_id, text, buttons=None):
+        self._users.append((chat_id, text, buttons or []))
+
+    def _digests(self):
+        text, rows = "", []
+        for part, part_rows in self._admin:
+            for chunk in _split_text(part, MAX_MESSAGE_LENGTH):
+                merged = f"{text}{DIGEST_SEPARATOR}{chunk}" if text else chunk
+                if text and (
+                    len(merged) > MAX_MESSAGE_LENGTH
+                    or _count_buttons(rows + part_rows) > MAX_BUTTONS
+                ):
+                    yield text, rows
+                    merged, rows = chunk, []
+                text = merged
+            rows = rows + part_rows
+        if text:
+            yield text, rows
+
+    async def _send(self, chat_id, text, rows):
+        while True:
+            if chat_id == self.admin_id:
+                await self.admin_bucket.acquire()
+            await self.bucket.acquire()
+            try:
+                await self.send(chat_id, text, buttons=rows or None)
+                return
+            except self.flood_errors as e:
+                await asyncio.sleep(e.seconds)
+            except Exception as e:
+                print(f"Failed to send message to {chat_id}: {e}")
+                return
+
+    async def flush(self):
+        """
+        Send everything queued so far: customer messages first, then the
+        admin digest.
+        """
+        users, self._users = self._users, []
+        digests = list(self._digests())
+        self._admin = []
+
+        for chat_id, text, rows in users:
+            await self._send(chat_id, text, rows)
+        for text, rows in digests:
+            await self._send(self.admin_id, text, rows)
+
+
+def _count_buttons(rows):
+    return sum(len(row) for row in rows)
+
+
+def _split_text(text, limit):
+    """
+    Split text into chunks of at most ``limit`` characters, preferring line
+    breaks.
+    """
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit)
+        if cut <= 0:
+            cut = limit
+        yield text[:cut]
+        text = text[cut:].lstrip("\n")
+    yield text
@@ -0,0 +1,144 @@
+"""
+Set-based plan operations.
+
+These run inside ``Database.transaction`` and take the transaction's cursor,
+so a change to every rental costs one statement and one commit.
+"""
+
+# SQLite's default limit on bound parameters is 999 on older builds.
+MAX_IN_PARAMS = 500
+
+EXPIRING_RENTALS_QUERY = """
+    SELECT 
+        r.rental_id,
+        t.tg_user_id AS telegram_id, 
+        t.tg_first_name, 
+        u.linux_username, 
+        r.end_time
+    FROM rentals r INDEXED BY idx_rentals_pending_warning
+    LEFT JOIN telegram_users t ON r.telegram_id = t.tg_user_id
+    LEFT JOIN users u ON r.user_id = u.user_id
+    WHERE r.end_time <= ? 
+      AND r.end_time > ? 
+      AND r.sent_expiry_notification = 0
+      AND r.is_active = 1;"""
+
+EXPIRED_RENTALS_QUERY = """
+    SELECT 
+        r.rental_id,
+        t.tg_user_id, 
+        u.linux_username
+    FROM rentals r INDEXED BY idx_rentals_pending_expiry
+    LEFT JOIN telegram_users t ON r.telegram_id = t.tg_user_id
+    LEFT JOIN users u ON r.user_id = u.user_id
+    WHERE r.end_time <= ? 
+      AND r.is_expired = 0
+      AND r.is_active = 1;"""
+
+# Columns returned for each changed rental: enough to re-key the expiry
+# scheduler and to notify the linked Telegram user.
+CHANGED_RENTAL_COLUMNS = """
+    r.rental_id, r.end_time, r.sent_expiry_notification, r.is_expired,
+    r.is_active, r.telegram_id, t.tg_first_name, u.linux_username
+"""
+
+
+def shift_all_rentals(cursor, duration_change_seconds, now):
+    """
+    Move the end_time of every live rental by ``duration_change_seconds``.
+
+    Extending (positive change) applies to every active rental and clears
+    its expiry flags, like ``extend_plan_helper``. Reducing (negative
+    change) skips expired rentals and rentals that would already be expired
+    afterwards, like ``modify_plan_duration``.
+
+    Returns ``(changed_rows, skipped_count)``; the rows carry the new
+    end_time and flags.
+    """
+    if duration_change_seconds >= 0:
+        predicate = "r.is_active = 1"
+        params = ()
+        update = """UPDATE rentals
+            SET end_time = end_time + ?,
+                sent_expiry_notification = 0,
+                is_expired = 0
+            WHERE is_active = 1"""
+        update_params = (duration_change_seconds,)
+        skipped = 0
+    else:
+        predicate = "r.is_active = 1 AND r.is_expired = 0 AND r.end_time + ? >= ?"
+        params = (duration_change_seconds, now)
+        update = """UPDATE rentals
+            SET end_time = end_time + ?
+            WHERE is_active = 1 AND is_expired = 0 AND end_time + ? >= ?"""
+        update_params = (duration_change_seconds, duration_change_seconds, now)
+        skipped = cursor.execute(
+            """SELECT COUNT(*) FROM rentals
+            WHERE is_active = 1 AND is_expired = 0 AND end_time + ? < ?""",
+            (duration_change_seconds, now),
+        ).fetchone()[0]
+
+    rows = cursor.execute(
+        f"""SELECT {CHANGED_RENTAL_COLUMNS}
+        FROM rentals r
+        LEFT JOIN telegram_users t ON r.telegram_id = t.tg_user_id
+        LEFT JOIN users u ON r.user_id = u.user_id
+        WHERE {predicate}""",
+        params,
+    ).fetchall()
+    cursor.execute(update, update_params)
+
+    changed = []
+    for (
+        rental_id,
+        end_time,
+        sent_expiry_notification,
+        is_expired,
+        is_active,
+        telegram_id,
+        tg_first_name,
+        username,
+    ) in rows:
+        if duration_change_seconds >= 0:
+            sent_expiry_notification, is_expired = 0, 0
+        changed.append(
+            (
+                rental_id,
+                end_time + duration_change_seconds,
+                sent_expiry_notification,
+                is_expired,
+                is_active,
+                telegram_id,
+                tg_first_name,
+                username,
+            )
+        )
+    return changed, skipped
+
+
+def _set_flag(cursor, column, rental_ids):
+    for i in range(0, len(rental_ids), MAX_IN_PARAMS):
+        chunk = rental_ids[i : i + MAX_IN_PARAMS]
+        placeholders = ", ".join("?" * len(chunk))
+        cursor.execute(
+            f"UPDATE rentals SET {column} = 1 WHERE rental_id IN ({placeholders})",
+            chunk,
+        )
+
+
+def claim_expiry_notifications(cursor, now, warning_window):
+    """
+    Collect every rental due for a warning or an expiry and flag them all
+    in one pass, so a tick costs one transaction however many plans are due.
+
+    Returns ``(expiring, expired)`` rows shaped like EXPIRING_RENTALS_QUERY
+    and EXPIRED_RENTALS_QUERY.
+    """
+    expiring = cursor.execute(
+        EXPIRING_RENTALS_QUERY, (now + warning_window, now)
+    ).fetchall()
+    expired = cursor.execute(EXPIRED_RENTALS_QUERY, (now,)).fetchall()
+
+    _set_flag(cursor, "sent_expiry_notification", [row[0] for row in expiring])
+    _set_flag(cursor, "is_expired", [row[0] for row in expired])
+    return expiring, expired
@@ -0,0 +1,137 @@
+import asyncio
+from dataclasses import dataclass
+
+from shacrypt import sha512_crypt
+
+
+@dataclass
+class CommandResult:
+    args: list
+    returncode: int
+    stdout: str = ""
+    stderr: str = ""
+    timed_out: bool = False
+
+    @property
+    def ok(self):
+        return self.returncode == 0 and not self.timed_out
+
+    def error(self):
+        if self.timed_out:
+            return f"`{' '.join(self.args)}` timed out"
+        return self.stderr.strip() or f"`{' '.join(self.args)}` exited with {self.returncode}"
+
+
+class ProvisioningError(Exception):
+    def __init__(self, result):
+        super().__init__(result.error())
+        self.result = result
+
+
+class SubprocessRunner:
+    """
+    Default backend: runs commands with ``asyncio.create_subprocess_exec``
+    so they never block the event loop.
+    """
+
+    async def run(self, args, input=None, timeout=None):
+        process = await asyncio.create_subprocess_exec(
+            *args,
+            stdin=asyncio.subprocess.PIPE if input is not None else None,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(
+                process.communicate(input.encode() if input is not None else None),
+                timeout,
+            )
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            return CommandResult(list(args), process.returncode, timed_out=True)
+        return CommandResult(
+            list(args), process.returncode, stdout.decode(), stderr.decode()
+        )
+
+
+class Provisioner:
+    """
+    Single path for system account operations.
+
+    Commands run through a pluggable ``runner`` (anything with an async
+    ``run(args, input=None, timeout=None)`` returning a CommandResult), at
+    most ``concurrency`` at a time, each with a per-command timeout.
+    """
+
+    # Seconds allowed per command; userdel -r may have a big home to remove.
+    TIMEOUTS = {"userdel": 600, "useradd": 60, "chpasswd": 120, "newusers": 600}
+    DEFAULT_TIMEOUT = 30
+
+    def __init__(self, runner=None, concurrency=4):
+        self.runner = runner or SubprocessRunner()
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(self, args, input=None, check=False):
+        """
+        Run a command (``sudo`` prefixes are skipped when picking the
+        timeout) and return its CommandResult, raising ProvisioningError on
+        failure if ``check`` is set.
+        """
+        command = args[1] if args[0] == "sudo" else args[0]
+        timeout = self.TIMEOUTS.get(command, self.DEFAULT_TIMEOUT)
+        async with self._semaphore:
+            result = await self.runner.run(args, input=input, timeout=timeout)
+        if check and not result.ok:
+            raise ProvisioningError(result)
+        return result
+
+    async def hash_password(self, password):
+        return await asyncio.to_thread(sha512_crypt, password)
+
+    async def hash_passwords(self, passwords):
+        """
+        Hash ``{username: password}`` in one worker thread call and return
+        a list of ``(username, hash)`` pairs.
+        """
+        return await asyncio.to_thread(
+            lambda: [
+                (username, sha512_crypt(password))
+                for username, password in passwords.items()
+            ]
+        )
+
+    async def create_user(self, username, hashed_password):
+        return await self.run(
+            ["sudo", "useradd", "-m", "-s", "/bin/bash", "-p", hashed_password, username],
+            check=True,
+        )
+
+    async def create_users(self, passwords):
+        """
+        Create many accounts from ``{username: password}`` with a single
+        ``newusers`` call; it hashes the passwords and creates the homes.
+        """
+        lines = "".join(
+            f"{username}:{password}::::/home/{username}:/bin/bash\n"
+            for username, password in passwords.items()
+        )
+        return await self.run(["sudo", "newusers"], input=lines, check=True)
+
+    async def set_password_hashes(self, hashes):
+        """
+        Set many pre-hashed passwords with a single ``chpasswd -e`` call.
+        """
+        lines = "".join(f"{username}:{hashed}\n" for username, hashed in hashes)
+        return await self.run(["sudo", "chpasswd", "-e"], input=lines, check=True)
+
+    async def remove_ssh_keys(self, username):
+        return await self.run(
+            ["sudo", "rm", f"/home/{username}/.ssh/authorized_keys"]
+        )
+
+    async def kill_processes(self, username):
+        return await self.run(["sudo", "pkill", "-9", "-u", username])
+
+    async def delete_user(self, username):
+        return await self.run(["sudo", "userdel", "-r", username])
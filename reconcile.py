@@ -0,0 +1,212 @@
+"""
+Reconciliation between the rentals database and the system accounts.
+
+``Reconciler.plan()`` computes the full diff in one pass (one database
+query, one passwd check and one scan of ``/proc``); ``Reconciler.apply()``
+fixes what can be fixed safely through a bounded pool of workers.
+"""
+
+import asyncio
+import os
+from dataclasses import dataclass, field
+
+# One row per user: whether it still has a live rental and whether it has
+# an expired one that has not been deleted.
+SYNC_STATE_QUERY = """
+SELECT u.linux_username, u.linux_password,
+    COALESCE(MAX(r.is_active = 1 AND r.is_expired = 0), 0) AS live,
+    COALESCE(MAX(r.is_active = 1 AND r.is_expired = 1), 0) AS expired
+FROM users u
+LEFT JOIN rentals r ON r.user_id = u.user_id
+GROUP BY u.user_id
+"""
+
+
+def running_uids(proc_path="/proc"):
+    """
+    Return ``{uid: process_count}`` for every process visible in ``/proc``.
+    """
+    counts = {}
+    for entry in os.listdir(proc_path):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(os.path.join(proc_path, entry, "status"), "r") as f:
+                for line in f:
+                    if line.startswith("Uid:"):
+                        uid = int(line.split()[1])
+                        counts[uid] = counts.get(uid, 0) + 1
+                        break
+        except (OSError, ValueError, IndexError):
+            # The process exited while we were scanning.
+            continue
+    return counts
+
+
+@dataclass
+class SyncPlan:
+    # Live rentals with no system account: (username, password)
+    missing: list = field(default_factory=list)
+    # Accounts in the rental UID range with no database row: (username, uid)
+    orphaned: list = field(default_factory=list)
+    # Expired rentals whose account still runs processes: (username, processes)
+    expired_live: list = field(default_factory=list)
+
+    @property
+    def empty(self):
+        return not (self.missing or self.orphaned or self.expired_live)
+
+    @property
+    def actionable(self):
+        """
+        True if ``apply`` would change anything; orphans are report only.
+        """
+        return bool(self.missing or self.expired_live)
+
+    def summary(self, limit=30):
+        """
+        Markdown report of the plan, listing at most ``limit`` accounts per
+        category.
+        """
+        if self.empty:
+            return "✅ Database and system accounts are in sync."
+        sections = [
+            (
+                f"👤 **Missing accounts** ({len(self.missing)}), will be recreated:",
+                [f"`{username}`" for username, _ in self.missing],
+            ),
+            (
+                f"⏰ **Expired but still running** ({len(self.expired_live)}), "
+                "processes will be killed and SSH keys removed:",
+                [
+                    f"`{username}` ({processes} processes)"
+                    for username, processes in self.expired_live
+                ],
+            ),
+            (
+                f"❓ **Accounts not in the database** ({len(self.orphaned)}), "
+                "report only:",
+                [f"`{username}` (uid {uid})" for username, uid in self.orphaned],
+            ),
+        ]
+        lines = []
+        for title, items in sections:
+            if not items:
+                continue
+            lines.append(title)
+            lines.extend(f"  • {item}" for item in items[:limit])
+            if len(items) > limit:
+                lines.append(f"  ...and {len(items) - limit} more.")
+        return "\n".join(lines)
+
+
+@dataclass
+class SyncResult:
+    applied: int = 0
+    failed: list = field(default_factory=list)
+
+    def summary(self):
+        text = f"✅ Applied {self.applied} change(s)."
+        if self.failed:
+            text += f"\n❌ {len(self.failed)} failed:\n" + "\n".join(
+                f"  • `{username}`: {error}" for username, error in self.failed
+            )
+        return text
+
+
+class Reconciler:
+    """
+    Diff the database against the system accounts and repair the drift.
+
+    Missing accounts are recreated through the provisioner with the
+    password stored in the database. Orphaned accounts are only reported, never removed: they may belong to
+    the admin or another service. Only accounts with ``uid_min <= uid <=
+    uid_max`` and not in ``ignore`` are considered.
+    """
+
+    def __init__(
+        self,
+        db,
+        accounts,
+        provisioner,
+        uid_min=1000,
+        uid_max=60000,
+        ignore=(),
+        workers=4,
+        proc_path="/proc",
+    ):
+        self.db = db
+        self.accounts = accounts
+        self.provisioner = provisioner
+        self.uid_min = uid_min
+        self.uid_max = uid_max
+        self.ignore = set(ignore)
+        self.workers = workers
+        self.proc_path = proc_path
+
+    def _read_accounts(self, known):
+        # Blocking passwd reads, run in a worker thread by plan().
+        system = self.accounts.in_uid_range(self.uid_min, self.uid_max)
+        uids = {}
+        for username in self.accounts.exists_many(known):
+            account = self.accounts.get(username)
+            if account:
+                uids[username] = account[0]
+        return system, uids
+
+    async def plan(self):
+        rows = await self.db.fetchall(SYNC_STATE_QUERY, reader=True)
+        known = {username for username, *_ in rows}
+        system, uids = await asyncio.to_thread(self._read_accounts, known)
+        processes = await asyncio.to_thread(running_uids, self.proc_path)
+
+        plan = SyncPlan()
+        for username, password, live, expired in rows:
+            if live and username not in uids:
+                plan.missing.append((username, password))
+            elif expired and not live and username in uids:
+                running = processes.get(uids[username], 0)
+                if running:
+                    plan.expired_live.append((username, running))
+        plan.orphaned = sorted(
+            (username, uid)
+            for username, uid in system.items()
+            if username not in known and username not in self.ignore
+        )
+        return plan
+
+    async def _recreate(self, username, password):
+        hashed_password = await self.provisioner.hash_password(password)
+        await self.provisioner.create_user(username, hashed_password)
+
+    async def _shut_down(self, username):
+        await self.provisioner.kill_processes(username)
+        # A missing authorized_keys file is not an error here.
+        await self.provisioner.remove_ssh_keys(username)
+
+    async def apply(self, plan):
+        """
+        Apply ``plan`` and return a SyncResult. Each change runs as its own
+        job, so one failing account does not stop the others.
+        """
+        queue = asyncio.Queue()
+        for username, password in plan.missing:
+            queue.put_nowait((username, self._recreate, (username, password)))
+        for username, _ in plan.expired_live:
+            queue.put_nowait((username, self._shut_down, (username,)))
+        result = SyncResult()
+
+        async def worker():
+            while not queue.empty():
+                username, job, args = queue.get_nowait()
+                try:
+                    await job(*args)
+                except Exception as e:
+                    result.failed.append((username, str(e)))
+                else:
+                    result.applied += 1
+
+        await asyncio.gather(
+            *(worker() for _ in range(min(self.workers, queue.qsize())))
+        )
+        return result
@@ -0,0 +1,104 @@
+import asyncio
+import hashlib
+import os
+import re
+import shutil
+from collections import OrderedDict
+
+# Dropped into every entry directory, so a restart only clears what this
+# cache wrote and never other files in a shared REPORT_CACHE_DIR.
+MARKER = ".report_cache_entry"
+_ENTRY_NAME = re.compile(r"[0-9a-f]{40}")
+
+
+class ReportCache:
+    """
+    Size-bounded, on-disk LRU cache of rendered reports.
+
+    Callers key entries on something that changes whenever the underlying
+    data does (e.g. ``(kind, db.data_version)``), so an unchanged dataset is
+    served from disk without querying or rendering again. Concurrent misses
+    for the same key share one render. Entries left by a previous run are
+    removed on start because their keys are meaningless; nothing else in
+    the directory is touched.
+    """
+
+    def __init__(self, directory, max_bytes=50 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._inflight = {}
+        os.makedirs(directory, exist_ok=True)
+        self._clear_stale()
+
+    def _clear_stale(self):
+        for name in os.listdir(self.directory):
+            entry_dir = os.path.join(self.directory, name)
+            if _ENTRY_NAME.fullmatch(name) and os.path.isfile(
+                os.path.join(entry_dir, MARKER)
+            ):
+                shutil.rmtree(entry_dir, ignore_errors=True)
+
+    def _entry_dir(self, key):
+        return os.path.join(
+            self.directory, hashlib.sha1(repr(key).encode()).hexdigest()
+        )
+
+    def _evict(self):
+        while self._size > self.max_bytes and len(self._entries) > 1:
+            key, (path, size) = self._entries.popitem(last=False)
+            shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+            self._size -= size
+            self.evictions += 1
+
+    async def _render(self, key, filename, render):
+        entry_dir = self._entry_dir(key)
+        os.makedirs(entry_dir, exist_ok=True)
+        open(os.path.join(entry_dir, MARKER), "w").close()
+        path = os.path.join(entry_dir, filename)
+        try:
+            await render(path)
+            size = os.path.getsize(path)
+        except BaseException:
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            raise
+        self._entries[key] = (path, size)
+        self._size += size
+        self._evict()
+        return path
+
+    async def get(self, key, filename, render):
+        """
+        Return the path of the cached report for ``key``. On a miss the
+        coroutine function ``render(path)`` is awaited to write the report
+        to ``path``, a fresh file named ``filename``. The path stays valid until the entry is
+        evicted, so send it right away.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._render(key, filename, render))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.hits += 1
+        return await asyncio.shield(task)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups * 100 if lookups else 0
+        return (
+            f"{len(self._entries)} reports, {self._size / 1024:.0f} KiB, "
+            f"{self.hits} hits, {self.misses} misses ({hit_rate:.1f}% hit rate), "
+            f"{self.evictions} evictions"
+        )
@@ -0,0 +1,28 @@
+"""
+SQL behind the generated reports, kept free of bot and rendering imports
+so the benchmarks can run it directly.
+"""
+
+# One row per user and payment currency. Only the latest rental of each
+# user is joined (a MAX over idx_rentals_user_id), so a user's payments are
+# totalled once per currency over their idx_payments_user_currency range
+# instead of once per rental: R rentals and P payments no longer produce
+# R x P rows or R times inflated totals.
+PAYMENTS_REPORT_QUERY = """
+    SELECT
+        u.user_id,
+        u.linux_username AS username,
+        u.creation_time,
+        r.end_time AS expiry_time,
+        r.is_expired,
+        COALESCE(SUM(p.amount), 0) AS total_payment,
+        p.currency,
+        COUNT(p.payment_id) AS payment_count
+    FROM users u
+    LEFT JOIN rentals r ON r.rental_id = (
+        SELECT MAX(rental_id) FROM rentals WHERE user_id = u.user_id
+    )
+    LEFT JOIN payments p ON p.user_id = u.user_id
+    GROUP BY u.user_id, p.currency
+    ORDER BY u.user_id, p.currency
+    """
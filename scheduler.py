@@ -0,0 +1,92 @@
+import asyncio
+import heapq
+import itertools
+import time
+
+WARNING_WINDOW = 12 * 60 * 60
+
+WARNING = "warning"
+EXPIRED = "expired"
+
+
+class ExpiryScheduler:
+    """
+    Min-heap of upcoming rental deadlines.
+
+    Each active rental contributes up to two deadlines: the 12 hour warning
+    (``end_time - WARNING_WINDOW``) and the expiry itself (``end_time``).
+    Rescheduling a rental bumps its version; stale heap entries are skipped
+    when they surface instead of being searched for and removed.
+    """
+
+    def __init__(self, max_sleep=3600):
+        # Upper bound on a single sleep, so wall clock jumps are noticed.
+        self.max_sleep = max_sleep
+        self._heap = []
+        self._versions = {}
+        self._counter = itertools.count()
+        self._changed = asyncio.Event()
+
+    def __len__(self):
+        return len(self._versions)
+
+    def update(self, rental_id, end_time, sent_expiry_notification, is_expired, is_active=1):
+        """
+        (Re)schedule a rental from its current ``rentals`` row values.
+        """
+        version = next(self._counter)
+        if not is_active or is_expired:
+            self._versions.pop(rental_id, None)
+        else:
+            self._versions[rental_id] = version
+            if not sent_expiry_notification:
+                heapq.heappush(
+                    self._heap, (end_time - WARNING_WINDOW, version, WARNING, rental_id)
+                )
+            heapq.heappush(self._heap, (end_time, version, EXPIRED, rental_id))
+        self._changed.set()
+
+    def discard(self, rental_id):
+        if self._versions.pop(rental_id, None) is not None:
+            self._changed.set()
+
+    def _is_current(self, entry):
+        _, version, _, rental_id = entry
+        return self._versions.get(rental_id) == version
+
+    def next_deadline(self):
+        while self._heap and not self._is_current(self._heap[0]):
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now=None):
+        """
+        Remove and return ``(kind, rental_id)`` for every deadline at or
+        before ``now``.
+        """
+        now = time.time() if now is None else now
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            entry = heapq.heappop(self._heap)
+            if self._is_current(entry):
+                due.append((entry[2], entry[3]))
+                if entry[2] == EXPIRED:
+                    del self._versions[entry[3]]
+        return due
+
+    async def wait_due(self):
+        """
+        Sleep until the next deadline (or a reschedule) and return the due
+        entries. Returns an empty list when woken early.
+        """
+        self._changed.clear()
+        deadline = self.next_deadline()
+        timeout = self.max_sleep
+        if deadline is not None:
+            timeout = min(max(deadline - time.time(), 0), self.max_sleep)
+        if timeout > 0:
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.pop_due()
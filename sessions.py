@@ -0,0 +1,192 @@
+"""
+Login sessions for `/who`, read straight from the utmp file.
+
+``read_utmp`` parses the binary records with ``struct`` instead of running
+``w``, and ``SessionMonitor`` joins the live sessions to the tenants in the
+database behind a short TTL cache, so repeated Refresh taps within a few
+seconds share one refresh (single-flight) and never fork a process. The
+parsed records are also keyed on the file's mtime and size, so a refresh
+only reads the file again after a login or logout has changed it.
+"""
+
+import asyncio
+import os
+import struct
+import time
+from dataclasses import dataclass, field
+
+from plans import MAX_IN_PARAMS
+from timeutils import format_time_delta, get_date_str
+
+# struct utmp on Linux (glibc, 64-bit and 32-bit alike): ut_type, ut_pid,
+# ut_line, ut_id, ut_user, ut_host, ut_exit, ut_session, ut_tv (two 32-bit
+# fields), ut_addr_v6 and padding; 384 bytes.
+UTMP_RECORD = struct.Struct("<h2xi32s4s32s256s4xiii16x20x")
+USER_PROCESS = 7
+
+TENANT_SESSIONS_QUERY = """
+    SELECT u.linux_username, r.end_time, r.is_expired, t.tg_user_id, t.tg_first_name
+    FROM users u
+    LEFT JOIN rentals r ON r.rental_id = (
+        SELECT MAX(rental_id) FROM rentals WHERE user_id = u.user_id
+    )
+    LEFT JOIN telegram_users t ON r.telegram_id = t.tg_user_id
+    WHERE u.linux_username IN ({placeholders})
+    """
+
+
+@dataclass(frozen=True)
+class Session:
+    user: str
+    line: str
+    host: str
+    login_time: int
+    pid: int
+
+
+def _text(raw):
+    return raw.split(b"\0", 1)[0].decode("utf-8", "replace")
+
+
+def parse_utmp(data):
+    """
+    Return the user sessions recorded in the bytes of a utmp file; a
+    truncated trailing record is ignored.
+    """
+    data = data[: len(data) - len(data) % UTMP_RECORD.size]
+    sessions = []
+    for ut_type, pid, line, _, user, host, _, tv_sec, _ in UTMP_RECORD.iter_unpack(data):
+        if ut_type == USER_PROCESS:
+            sessions.append(Session(_text(user), _text(line), _text(host), tv_sec, pid))
+    return sessions
+
+
+def alive(sessions, proc_path="/proc"):
+    # utmp keeps entries of sessions that died without logging out.
+    return [s for s in sessions if os.path.exists(f"{proc_path}/{s.pid}")]
+
+
+def read_utmp(path, proc_path="/proc"):
+    """
+    Return the user sessions in a utmp file whose login process is still
+    running.
+    """
+    with open(path, "rb") as f:
+        return alive(parse_utmp(f.read()), proc_path)
+
+
+@dataclass
+class WhoSnapshot:
+    taken_at: float
+    # username -> (end_time, is_expired, tg_user_id, tg_first_name, [sessions])
+    tenants: dict = field(default_factory=dict)
+    # username -> [sessions] for accounts that are not in the database
+    others: dict = field(default_factory=dict)
+    error: str = None
+
+    def summary(self, now, limit=30):
+        if self.error:
+            return f"❌ Could not read the login sessions: {self.error}"
+
+        lines = [f"🟢 **Online tenants:** {len(self.tenants)}\n"]
+        by_login = sorted(
+            self.tenants.items(), key=lambda item: min(s.login_time for s in item[1][4])
+        )
+        for username, (end_time, is_expired, tg_user_id, tg_first_name, sessions) in by_login[:limit]:
+            first_login = min(s.login_time for s in sessions)
+            hosts = ", ".join(sorted({s.host or "local" for s in sessions}))
+            tg_tag = f" [{tg_first_name}](tg://user?id={tg_user_id})" if tg_user_id else ""
+            if end_time is None:
+                plan = "no plan"
+            elif is_expired:
+                plan = "❌ expired"
+            else:
+                plan = f"expires {get_date_str(end_time)}"
+            lines.append(
+                f"• `{username}`{tg_tag}: {len(sessions)} session(s), online for "
+                f"`{format_time_delta(now - first_login)}` from {hosts} ({plan})"
+            )
+        if len(by_login) > limit:
+            lines.append(f"… and {len(by_login) - limit} more")
+        if self.others:
+            others = ", ".join(
+                f"`{username}` ({len(sessions)})"
+                for username, sessions in sorted(self.others.items())
+            )
+            lines.append(f"\n👤 **Other accounts:** {others}")
+        lines.append(f"\n🕒 Updated {int(now - self.taken_at)}s ago")
+        return "\n".join(lines)
+
+
+class SessionMonitor:
+    """
+    Cached view of who is logged in. A snapshot is reused for ``ttl``
+    seconds, and concurrent requests for a stale one share a single
+    refresh, which re-reads the utmp file only if its mtime or size has
+    changed since the last read.
+    """
+
+    def __init__(self, db, path="/var/run/utmp", ttl=5, proc_path="/proc"):
+        self.db = db
+        self.path = path
+        self.ttl = ttl
+        self.proc_path = proc_path
+        self.hits = 0
+        self.reads = 0
+        self._snapshot = None
+        self._inflight = None
+        self._utmp_key = None
+        self._utmp_sessions = []
+
+    async def _tenants(self, usernames):
+        rows = []
+        for i in range(0, len(usernames), MAX_IN_PARAMS):
+            chunk = usernames[i : i + MAX_IN_PARAMS]
+            rows += await self.db.fetchall(
+                TENANT_SESSIONS_QUERY.format(placeholders=", ".join("?" * len(chunk))),
+                chunk,
+                reader=True,
+            )
+        return rows
+
+    def _read(self):
+        stat = os.stat(self.path)
+        key = (stat.st_mtime_ns, stat.st_size)
+        if key != self._utmp_key:
+            with open(self.path, "rb") as f:
+                self._utmp_sessions = parse_utmp(f.read())
+            self._utmp_key = key
+            self.reads += 1
+        return alive(self._utmp_sessions, self.proc_path)
+
+    async def _refresh(self):
+        snapshot = WhoSnapshot(time.time())
+        try:
+            sessions = await asyncio.to_thread(self._read)
+        except (OSError, struct.error) as e:
+            snapshot.error = str(e)
+            self._snapshot = snapshot
+            return snapshot
+
+        by_user = {}
+        for session in sessions:
+            by_user.setdefault(session.user, []).append(session)
+        for username, *row in await self._tenants(list(by_user)):
+            snapshot.tenants[username] = (*row, by_user.pop(username))
+        snapshot.others = by_user
+        self._snapshot = snapshot
+        return snapshot
+
+    async def snapshot(self):
+        cached = self._snapshot
+        if cached and time.time() - cached.taken_at < self.ttl:
+            self.hits += 1
+            return cached
+
+        if self._inflight is None:
+            self._inflight = asyncio.ensure_future(self._refresh())
+            self._inflight.add_done_callback(lambda _: setattr(self, "_inflight", None))
+        return await asyncio.shield(self._inflight)
+
+    def stats(self):
+        return f"{self.hits} cache hits, {self.reads} utmp reads"
@@ -0,0 +1,84 @@
+"""
+In-process SHA-512 crypt (``$6$``), compatible with glibc crypt(3) and
+``openssl passwd -6``, following Ulrich Drepper's SHA-crypt specification.
+
+Hashing in-process avoids forking ``openssl`` for every password.
+"""
+
+import hashlib
+import secrets
+
+ITOA64 = "./0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+
+ROUNDS_DEFAULT = 5000
+ROUNDS_MIN = 1000
+ROUNDS_MAX = 999999999
+SALT_LENGTH = 16
+
+# Order in which the digest bytes are encoded, three at a time.
+_PERMUTATION = [
+    (0, 21, 42), (22, 43, 1), (44, 2, 23), (3, 24, 45), (25, 46, 4),
+    (47, 5, 26), (6, 27, 48), (28, 49, 7), (50, 8, 29), (9, 30, 51),
+    (31, 52, 10), (53, 11, 32), (12, 33, 54), (34, 55, 13), (56, 14, 35),
+    (15, 36, 57), (37, 58, 16), (59, 17, 38), (18, 39, 60), (40, 61, 19),
+    (62, 20, 41),
+]
+
+
+def _b64_from_24bit(b2, b1, b0, n):
+    w = (b2 << 16) | (b1 << 8) | b0
+    out = []
+    for _ in range(n):
+        out.append(ITOA64[w & 0x3F])
+        w >>= 6
+    return "".join(out)
+
+
+def _repeat(digest, length):
+    return (digest * (length // len(digest) + 1))[:length]
+
+
+def generate_salt():
+    return "".join(secrets.choice(ITOA64) for _ in range(SALT_LENGTH))
+
+
+def sha512_crypt(password, salt=None, rounds=ROUNDS_DEFAULT):
+    """
+    Return the ``$6$`` crypt hash of ``password``. A random 16 character
+    salt is generated when none is given.
+    """
+    key = password.encode()
+    salt = (salt or generate_salt())[:SALT_LENGTH]
+    salt_bytes = salt.encode()
+    custom_rounds = rounds != ROUNDS_DEFAULT
+    rounds = min(max(rounds, ROUNDS_MIN), ROUNDS_MAX)
+
+    alternate = hashlib.sha512(key + salt_bytes + key).digest()
+
+    a = hashlib.sha512(key + salt_bytes)
+    a.update(_repeat(alternate, len(key)))
+    n = len(key)
+    while n > 0:
+        a.update(alternate if n & 1 else key)
+        n >>= 1
+    digest = a.digest()
+
+    p = _repeat(hashlib.sha512(key * len(key)).digest(), len(key))
+    s = _repeat(hashlib.sha512(salt_bytes * (16 + digest[0])).digest(), len(salt_bytes))
+
+    for i in range(rounds):
+        c = hashlib.sha512(p if i & 1 else digest)
+        if i % 3:
+            c.update(s)
+        if i % 7:
+            c.update(p)
+        c.update(digest if i & 1 else p)
+        digest = c.digest()
+
+    encoded = "".join(
+        _b64_from_24bit(digest[i], digest[j], digest[k], 4)
+        for i, j, k in _PERMUTATION
+    ) + _b64_from_24bit(0, 0, digest[63], 2)
+
+    prefix = f"$6$rounds={rounds}$" if custom_rounds else "$6$"
+    return f"{prefix}{salt}${encoded}"
@@ -0,0 +1,11 @@
+import os
+import sys
+
+# constants refuses to load without the bot settings; the tests never
+# talk to Telegram, so placeholders are enough.
+for name in ("API_ID", "API_HASH", "BOT_TOKEN", "ADMIN_ID", "GROUP_ID"):
+    os.environ.setdefault(name, "1")
+os.environ.setdefault("SSH_PORT", "22")
+os.environ.setdefault("SSH_HOSTNAME", "localhost")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,161 @@
+import asyncio
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from database import Database
+from exchange import ExchangeRates, ExchangeRateUnavailable
+
+EXCHANGE_RATES_TABLE = """CREATE TABLE exchange_rates (
+    base TEXT NOT NULL,
+    quote TEXT NOT NULL,
+    rate REAL NOT NULL,
+    fetched_at INTEGER NOT NULL,
+    PRIMARY KEY (base, quote)
+)"""
+
+
+class Upstream:
+    """
+    Stand-in for the exchange rate API on localhost.
+    """
+
+    def __init__(self, rate=83.0, status=200, delay=0):
+        self.rate = rate
+        self.status = status
+        self.delay = delay
+        self.hits = 0
+        self.server = None
+
+    async def handle(self, request):
+        self.hits += 1
+        await asyncio.sleep(self.delay)
+        if self.status != 200:
+            return web.Response(status=self.status)
+        return web.json_response({"base": request.match_info["base"], "rates": {"INR": self.rate}})
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_get("/latest/{base}", self.handle)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.server.close()
+
+    @property
+    def url(self):
+        return f"http://{self.server.host}:{self.server.port}/latest/{{base}}"
+
+
+def make_db():
+    db = Database(":memory:")
+    db.execute_sync(EXCHANGE_RATES_TABLE)
+    return db
+
+
+def test_concurrent_lookups_share_one_request():
+    async def run():
+        async with Upstream(delay=0.1) as upstream:
+            rates = ExchangeRates(make_db(), upstream.url)
+            try:
+                results = await asyncio.gather(
+                    *(rates.get_rate("USD", "INR") for _ in range(20))
+                )
+            finally:
+                await rates.close()
+        assert results == [83.0] * 20
+        assert upstream.hits == 1
+        assert rates.fetches == 1
+
+    asyncio.run(run())
+
+
+def age(rates, base, seconds):
+    fetched_at, cached = rates._rates[base]
+    rates._rates[base] = (fetched_at - seconds, cached)
+
+
+def test_cached_rate_is_reused_until_stale():
+    async def run():
+        async with Upstream() as upstream:
+            rates = ExchangeRates(make_db(), upstream.url, ttl=60)
+            try:
+                assert await rates.get_rate("USD", "INR") == 83.0
+                upstream.rate = 84.0
+                assert await rates.get_rate("USD", "INR") == 83.0
+                assert upstream.hits == 1
+
+                age(rates, "USD", 61)
+                assert await rates.get_rate("USD", "INR") == 84.0
+                assert upstream.hits == 2
+            finally:
+                await rates.close()
+
+    asyncio.run(run())
+
+
+def test_upstream_error_falls_back_to_persisted_rate():
+    async def run():
+        db = make_db()
+        async with Upstream() as upstream:
+            rates = ExchangeRates(db, upstream.url)
+            assert await rates.get_rate("USD", "INR") == 83.0
+            await rates.close()
+
+            # A restarted bot has only the stored rate while upstream fails.
+            upstream.status = 500
+            restarted = ExchangeRates(db, upstream.url, retry_interval=60)
+            try:
+                assert await restarted.get_rate("USD", "INR") == 83.0
+                assert restarted.fallbacks == 1
+
+                # The fallback is reused for retry_interval instead of
+                # hammering the failing API on every lookup.
+                assert await restarted.get_rate("USD", "INR") == 83.0
+                assert upstream.hits == 2
+            finally:
+                await restarted.close()
+
+    asyncio.run(run())
+
+
+def test_upstream_retried_after_retry_interval():
+    async def run():
+        async with Upstream() as upstream:
+            rates = ExchangeRates(make_db(), upstream.url, ttl=3600, retry_interval=60)
+            try:
+                await rates.get_rate("USD", "INR")
+                age(rates, "USD", 3601)
+
+                upstream.status = 500
+                assert await rates.get_rate("USD", "INR") == 83.0
+                assert await rates.get_rate("USD", "INR") == 83.0
+                assert upstream.hits == 2
+
+                upstream.status = 200
+                upstream.rate = 85.0
+                age(rates, "USD", 61)
+                assert await rates.get_rate("USD", "INR") == 85.0
+                assert upstream.hits == 3
+            finally:
+                await rates.close()
+
+    asyncio.run(run())
+
+
+def test_no_rate_at_all_raises():
+    async def run():
+        async with Upstream(status=500) as upstream:
+            rates = ExchangeRates(make_db(), upstream.url)
+            try:
+                await rates.get_rate("USD", "INR")
+            except ExchangeRateUnavailable:
+                pass
+            else:
+                raise AssertionError("expected ExchangeRateUnavailable")
+            finally:
+                await rates.close()
+
+    asyncio.run(run())
@@ -0,0 +1,114 @@
+import asyncio
+import time
+
+from fanout import FanOut
+
+
+class FakeFloodWait(Exception):
+    def __init__(self, seconds):
+        super().__init__(f"flood wait {seconds}s")
+        self.seconds = seconds
+
+
+class FakeBlocked(Exception):
+    pass
+
+
+class FakeClient:
+    """
+    Records every send attempt. ``floods`` maps a chat to the FloodWait
+    seconds raised on its first attempt; ``flaky`` chats fail once.
+    """
+
+    def __init__(self, latency=0.0, blocked=(), floods=None, flaky=()):
+        self.latency = latency
+        self.blocked = set(blocked)
+        self.floods = dict(floods or {})
+        self.flaky = set(flaky)
+        self.attempts = []
+        self.delivered = []
+
+    async def send_message(self, chat_id):
+        self.attempts.append((chat_id, time.monotonic()))
+        await asyncio.sleep(self.latency)
+        if chat_id in self.blocked:
+            raise FakeBlocked(chat_id)
+        if chat_id in self.floods:
+            raise FakeFloodWait(self.floods.pop(chat_id))
+        if chat_id in self.flaky:
+            self.flaky.discard(chat_id)
+            raise ConnectionError("transient")
+        self.delivered.append(chat_id)
+
+
+def make_fanout(client, **kwargs):
+    kwargs.setdefault("rate", 1000)
+    kwargs.setdefault("burst", 1000)
+    return FanOut(
+        client.send_message,
+        backoff=0.01,
+        flood_errors=(FakeFloodWait,),
+        blocked_errors=(FakeBlocked,),
+        **kwargs,
+    )
+
+
+def test_flood_wait_pauses_every_worker_and_retries():
+    client = FakeClient(floods={0: 0.2})
+    fanout = make_fanout(client, concurrency=1)
+
+    result = asyncio.run(fanout.run(range(5)))
+
+    assert (result.sent, result.failed, result.blocked) == (5, 0, 0)
+    assert sorted(client.delivered) == [0, 1, 2, 3, 4]
+    flood_at = client.attempts[0][1]
+    assert [chat_id for chat_id, _ in client.attempts].count(0) == 2
+    assert all(at - flood_at >= 0.19 for _, at in client.attempts[1:])
+
+
+def test_send_rate_stays_under_the_limit():
+    client = FakeClient()
+    fanout = make_fanout(client, rate=20, burst=2, concurrency=5)
+
+    start = time.monotonic()
+    result = asyncio.run(fanout.run(range(12)))
+    elapsed = time.monotonic() - start
+
+    assert result.sent == 12
+    # Two go out in the initial burst, the other ten at 20 per second.
+    assert elapsed >= 10 / 20 * 0.9
+    # No quarter second holds more than the burst, the refill and one
+    # token of timer slack.
+    window = 0.25
+    times = sorted(at for _, at in client.attempts)
+    for i, at in enumerate(times):
+        in_window = sum(1 for other in times[i:] if other - at < window)
+        assert in_window <= 2 + 20 * window + 1
+
+
+def test_blocked_chats_are_skipped_and_others_retried():
+    client = FakeClient(latency=0.01, blocked={1, 3}, flaky={2})
+    fanout = make_fanout(client)
+
+    result = asyncio.run(fanout.run([0, 1, 2, 3, 4, 4]))
+
+    assert (result.total, result.sent, result.failed, result.blocked) == (5, 3, 0, 2)
+    attempts = [chat_id for chat_id, _ in client.attempts]
+    assert attempts.count(1) == attempts.count(3) == 1
+    assert attempts.count(2) == 2
+    assert sorted(client.delivered) == [0, 2, 4]
+
+
+def test_persistent_failure_gives_up_after_max_retries():
+    class Broken(FakeClient):
+        async def send_message(self, chat_id):
+            self.attempts.append((chat_id, time.monotonic()))
+            raise ConnectionError("down")
+
+    client = Broken()
+    fanout = make_fanout(client, max_retries=2)
+
+    result = asyncio.run(fanout.run([7]))
+
+    assert (result.sent, result.failed) == (0, 1)
+    assert len(client.attempts) == 3
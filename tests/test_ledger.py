@@ -0,0 +1,55 @@
+import sqlite3
+
+from ledger import BALANCES_TABLE, history_records, migrate
+
+PAYMENTS_TABLE = """CREATE TABLE payments (
+    payment_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    amount REAL NOT NULL,
+    currency TEXT NOT NULL,
+    payment_date INTEGER NOT NULL
+)"""
+
+
+def make_conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute(PAYMENTS_TABLE)
+    conn.execute(BALANCES_TABLE)
+    conn.executemany(
+        "INSERT INTO payments (user_id, amount, currency, payment_date) VALUES (?, ?, ?, ?)",
+        [(1, 500, "INR", 100), (1, -200, "INR", 200), (2, 10, "USD", 300)],
+    )
+    conn.commit()
+    return conn
+
+
+def test_migrate_backfills_balances():
+    conn = make_conn()
+    with conn:
+        assert migrate(conn.cursor()) == 3
+    assert conn.execute(
+        "SELECT balance_after FROM payments ORDER BY payment_id"
+    ).fetchall() == [(500,), (300,), (10,)]
+    assert conn.execute(
+        "SELECT user_id, currency, balance, entries FROM balances ORDER BY user_id"
+    ).fetchall() == [(1, "INR", 300, 2), (2, "USD", 10, 1)]
+    with conn:
+        assert migrate(conn.cursor()) == 0
+
+
+def test_migrate_finishes_an_interrupted_backfill():
+    conn = make_conn()
+    # A previous start added the column, then failed before the backfill.
+    conn.execute("ALTER TABLE payments ADD COLUMN balance_after REAL")
+    conn.commit()
+
+    with conn:
+        assert migrate(conn.cursor()) == 3
+    assert conn.execute(
+        "SELECT COUNT(*) FROM payments WHERE balance_after IS NULL"
+    ).fetchone() == (0,)
+
+
+def test_history_records_tolerate_a_missing_balance():
+    records = list(history_records([(1, 500.0, "INR", 100, None)]))
+    assert records[0][-1] == "-"
@@ -0,0 +1,61 @@
+import json
+
+from onboarding import parse_tenant_file
+
+
+def parse_duration(value):
+    return int(value[:-1]) * 86400 if value.endswith("d") and value[:-1].isdigit() else 0
+
+
+def parse_json(records):
+    return parse_tenant_file(json.dumps(records).encode(), "tenants.json", parse_duration)
+
+
+def tenant(**fields):
+    record = {"username": "john", "duration": "30d", "amount": 500, "currency": "INR"}
+    record.update(fields)
+    return record
+
+
+def test_zero_amount_is_valid_in_json_and_csv():
+    tenants, errors = parse_json([tenant(amount=0)])
+    assert errors == []
+    assert tenants[0].amount == 0.0
+
+    csv_data = b"username,duration,amount,currency\njohn,30d,0,INR\n"
+    tenants, errors = parse_tenant_file(csv_data, "tenants.csv", parse_duration)
+    assert errors == []
+    assert tenants[0].amount == 0.0
+
+
+def test_missing_amount_is_rejected():
+    record = tenant()
+    del record["amount"]
+    tenants, errors = parse_json([record])
+    assert tenants == []
+    assert errors == ["Row 1: invalid amount ``"]
+
+
+def test_non_finite_amounts_are_rejected():
+    tenants, errors = parse_json(
+        [tenant(username="a", amount="NaN"), tenant(username="b", amount="inf"), tenant(username="c", amount=-1)]
+    )
+    assert tenants == []
+    assert errors == [
+        "Row 1: invalid amount `NaN`",
+        "Row 2: invalid amount `inf`",
+        "Row 3: invalid amount `-1`",
+    ]
+
+
+def test_unparsable_duration_is_reported_per_row():
+    def strict_parse_duration(value):
+        # Like bot.parse_duration on "30 days": a unit with no number before it.
+        if not value[:-1].isdigit():
+            raise ValueError(f"invalid duration `{value}`")
+        return parse_duration(value)
+
+    csv_data = b"username,duration,amount,currency\njohn,30 days,500,INR\njane,30d,500,INR\n"
+    tenants, errors = parse_tenant_file(csv_data, "tenants.csv", strict_parse_duration)
+    assert [tenant.username for tenant in tenants] == ["jane"]
+    assert errors == ["Row 2: invalid duration `30 days`"]
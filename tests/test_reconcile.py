@@ -0,0 +1,92 @@
+import asyncio
+import os
+
+from database import Database
+from provisioning import CommandResult, Provisioner
+from reconcile import Reconciler
+
+SCHEMA = (
+    """CREATE TABLE users (
+        user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        linux_username TEXT UNIQUE NOT NULL,
+        linux_password TEXT NOT NULL
+    )""",
+    """CREATE TABLE rentals (
+        rental_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        is_expired INTEGER DEFAULT 0,
+        is_active INTEGER DEFAULT 1
+    )""",
+)
+
+
+class Accounts:
+    def __init__(self, accounts):
+        self.accounts = accounts  # username -> uid
+
+    def in_uid_range(self, uid_min, uid_max):
+        return {name: uid for name, uid in self.accounts.items() if uid_min <= uid <= uid_max}
+
+    def exists_many(self, usernames):
+        return {name for name in usernames if name in self.accounts}
+
+    def get(self, username):
+        uid = self.accounts.get(username)
+        return (uid, f"/home/{username}") if uid is not None else None
+
+
+class Runner:
+    def __init__(self):
+        self.commands = []
+
+    async def run(self, args, input=None, timeout=None):
+        self.commands.append(args)
+        return CommandResult(list(args), 0)
+
+
+def make_proc(tmp_path, uids):
+    for pid, uid in enumerate(uids, start=100):
+        os.makedirs(tmp_path / str(pid))
+        (tmp_path / str(pid) / "status").write_text(f"Name:\tbash\nUid:\t{uid}\t{uid}\t{uid}\t{uid}\n")
+    return str(tmp_path)
+
+
+def test_plan_and_apply(tmp_path):
+    db = Database(":memory:")
+    for statement in SCHEMA:
+        db.execute_sync(statement)
+    for user_id, (username, is_expired) in enumerate(
+        [("lost", 0), ("done", 1), ("fine", 0)], start=1
+    ):
+        db.execute_sync(
+            "INSERT INTO users (user_id, linux_username, linux_password) VALUES (?, ?, 'secret')",
+            (user_id, username),
+        )
+        db.execute_sync(
+            "INSERT INTO rentals (user_id, is_expired) VALUES (?, ?)", (user_id, is_expired)
+        )
+
+    runner = Runner()
+    reconciler = Reconciler(
+        db,
+        Accounts({"done": 1001, "fine": 1002, "stray": 1003, "ubuntu": 1000}),
+        Provisioner(runner),
+        ignore=["ubuntu"],
+        proc_path=make_proc(tmp_path, [1001, 1001, 1002]),
+    )
+
+    async def run():
+        plan = await reconciler.plan()
+        assert plan.missing == [("lost", "secret")]
+        assert plan.expired_live == [("done", 2)]
+        assert plan.orphaned == [("stray", 1003)]
+        return await reconciler.apply(plan)
+
+    result = asyncio.run(run())
+    assert result.applied == 2 and result.failed == []
+    useradd = [args for args in runner.commands if args[1] == "useradd"]
+    assert len(useradd) == 1
+    assert useradd[0][-1] == "lost"
+    # The password is hashed before it reaches useradd.
+    assert useradd[0][-2].startswith("$6$")
+    assert ["sudo", "pkill", "-9", "-u", "done"] in runner.commands
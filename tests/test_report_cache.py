@@ -0,0 +1,27 @@
+import asyncio
+import os
+
+from report_cache import ReportCache
+
+
+async def write_report(path):
+    with open(path, "w") as f:
+        f.write("report")
+
+
+def test_restart_only_clears_cache_entries(tmp_path):
+    (tmp_path / "keep.txt").write_text("not ours")
+    (tmp_path / "notes").mkdir()
+    (tmp_path / "notes" / "todo.txt").write_text("not ours either")
+    # Named like an entry but without the marker, so not created by the cache.
+    (tmp_path / ("0" * 40)).mkdir()
+
+    cache = ReportCache(str(tmp_path))
+    path = asyncio.run(cache.get(("csv", 1), "report.csv", write_report))
+    assert os.path.exists(path)
+
+    ReportCache(str(tmp_path))
+    assert not os.path.exists(os.path.dirname(path))
+    assert (tmp_path / "keep.txt").read_text() == "not ours"
+    assert (tmp_path / "notes" / "todo.txt").exists()
+    assert (tmp_path / ("0" * 40)).is_dir()
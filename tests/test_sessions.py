@@ -0,0 +1,108 @@
+import asyncio
+import os
+
+from sessions import UTMP_RECORD, USER_PROCESS, SessionMonitor, read_utmp
+
+DEAD_PROCESS = 8
+
+
+def record(ut_type, pid, user, line, host, login_time):
+    return UTMP_RECORD.pack(
+        ut_type, pid, line.encode(), b"", user.encode(), host.encode(), 0, login_time, 0
+    )
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.queries = 0
+
+    async def fetchall(self, query, params, reader=False):
+        self.queries += 1
+        return [(username, None, None, None, None) for username in params]
+
+
+def write_utmp(path, *records):
+    path.write_bytes(b"".join(records))
+
+
+def test_read_utmp_keeps_live_user_sessions(tmp_path):
+    proc = tmp_path / "proc"
+    for pid in (101, 102, 103):
+        (proc / str(pid)).mkdir(parents=True)
+    utmp = tmp_path / "utmp"
+    write_utmp(
+        utmp,
+        record(USER_PROCESS, 101, "alice", "pts/0", "203.0.113.7", 1700000000),
+        record(DEAD_PROCESS, 102, "bob", "pts/1", "198.51.100.2", 1700000100),
+        record(USER_PROCESS, 103, "carol", "tty1", "", 1700000200),
+        # Still in utmp, but the login process is gone.
+        record(USER_PROCESS, 104, "dave", "pts/2", "192.0.2.9", 1700000300),
+    )
+
+    sessions = read_utmp(str(utmp), str(proc))
+
+    assert [(s.user, s.line, s.host, s.login_time, s.pid) for s in sessions] == [
+        ("alice", "pts/0", "203.0.113.7", 1700000000, 101),
+        ("carol", "tty1", "", 1700000200, 103),
+    ]
+
+
+def test_read_utmp_ignores_a_truncated_record(tmp_path):
+    (tmp_path / "proc" / "101").mkdir(parents=True)
+    utmp = tmp_path / "utmp"
+    full = record(USER_PROCESS, 101, "alice", "pts/0", "", 1700000000)
+    write_utmp(utmp, full, full[:100])
+
+    assert [s.user for s in read_utmp(str(utmp), str(tmp_path / "proc"))] == ["alice"]
+
+
+def test_monitor_rereads_only_after_the_file_changes(tmp_path):
+    proc = tmp_path / "proc"
+    (proc / "101").mkdir(parents=True)
+    (proc / "102").mkdir()
+    utmp = tmp_path / "utmp"
+    write_utmp(utmp, record(USER_PROCESS, 101, "alice", "pts/0", "", 1700000000))
+    os.utime(utmp, ns=(1, 1_000_000_000))
+    monitor = SessionMonitor(FakeDatabase(), str(utmp), ttl=0, proc_path=str(proc))
+
+    async def run():
+        first = await monitor.snapshot()
+        # The TTL has run out but the file is unchanged: no new read.
+        second = await monitor.snapshot()
+        assert monitor.reads == 1
+        assert list(first.tenants) == list(second.tenants) == ["alice"]
+
+        write_utmp(
+            utmp,
+            record(USER_PROCESS, 101, "alice", "pts/0", "", 1700000000),
+            record(USER_PROCESS, 102, "bob", "pts/1", "", 1700000100),
+        )
+        os.utime(utmp, ns=(2, 2_000_000_000))
+        third = await monitor.snapshot()
+        assert monitor.reads == 2
+        assert sorted(third.tenants) == ["alice", "bob"]
+
+        # A session that died without logging out drops off without a read.
+        (proc / "102").rmdir()
+        fourth = await monitor.snapshot()
+        assert monitor.reads == 2
+        assert list(fourth.tenants) == ["alice"]
+
+    asyncio.run(run())
+
+
+def test_monitor_shares_a_fresh_snapshot(tmp_path):
+    (tmp_path / "proc").mkdir()
+    utmp = tmp_path / "utmp"
+    write_utmp(utmp)
+    db = FakeDatabase()
+    monitor = SessionMonitor(db, str(utmp), ttl=60, proc_path=str(tmp_path / "proc"))
+
+    async def run():
+        snapshots = await asyncio.gather(*(monitor.snapshot() for _ in range(5)))
+        assert all(snapshot is snapshots[0] for snapshot in snapshots)
+        await monitor.snapshot()
+        assert monitor.reads == 1
+        assert monitor.hits == 1
+
+    asyncio.run(run())
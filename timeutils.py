@@ -0,0 +1,75 @@
+"""
+Date and duration formatting shared by the bot's messages and reports.
+
+The time zone is resolved once at import. Date strings only go down to the
+minute, so they are memoized per minute: report and listing columns repeat
+the same timestamps heavily, and each distinct one is formatted only once.
+"""
+
+from datetime import datetime
+from functools import lru_cache
+
+import pytz
+
+from constants import TIME_ZONE
+
+ZONE = pytz.timezone(TIME_ZONE)
+
+# Distinct minutes kept formatted; about 1.5 MiB when full.
+DATE_CACHE_SIZE = 16384
+
+
+def get_day_suffix(day):
+    if 11 <= day <= 13:
+        return "th"
+    else:
+        return {1: "st", 2: "nd", 3: "rd"}.get(day % 10, "th")
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def _format_minute(minute):
+    # Every zone offset in use is a whole number of minutes, so all epochs in
+    # a UTC minute share one local date string.
+    date = datetime.fromtimestamp(minute * 60, ZONE)
+    day_suffix = get_day_suffix(date.day)
+    day = date.day
+    return date.strftime(f"{day}{day_suffix} %B %Y, %I:%M %p IST")
+
+
+def get_date_str(epoch: int):
+    return _format_minute(int(epoch) // 60)
+
+
+def format_dates(epochs, missing="-"):
+    """
+    Format a column of epochs, with ``missing`` for ``None`` entries.
+    """
+    formatted = {None: missing}
+    result = []
+    for epoch in epochs:
+        date_str = formatted.get(epoch)
+        if date_str is None:
+            date_str = formatted[epoch] = get_date_str(epoch)
+        result.append(date_str)
+    return result
+
+
+def local_today():
+    return datetime.now(ZONE).date()
+
+
+def utc_offset_minutes():
+    """
+    The zone's current UTC offset, which the earnings buckets are cut at.
+    """
+    return int(datetime.now(ZONE).utcoffset().total_seconds()) // 60
+
+
+def format_time_delta(seconds):
+    """
+    Render a remaining or elapsed time as "X days, Y hours, Z minutes";
+    negative spans count as zero.
+    """
+    days, seconds = divmod(max(int(seconds), 0), 24 * 3600)
+    time_str = f"{days} days, " if days > 0 else ""
+    return time_str + f"{seconds // 3600} hours, {(seconds // 60) % 60} minutes"
@@ -0,0 +1,71 @@
+from collections import OrderedDict
+
+
+class UserKeyCache:
+    """
+    Bounded LRU cache from ``linux_username`` to ``(user_id, rental_id)``.
+
+    Handlers resolve a username once and bind the integer keys, instead of
+    repeating ``(SELECT user_id FROM users WHERE linux_username = ?)`` in
+    every statement. Entries must be invalidated whenever a username is
+    created, deleted or relinked; unknown usernames are never cached.
+    """
+
+    def __init__(self, db, maxsize=1024):
+        self.db = db
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        # Bumped by invalidate(), so a lookup that raced with it is dropped.
+        self._generation = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    async def get(self, username):
+        """
+        Return ``(user_id, rental_id)`` for a username, or None if there is
+        no such user. ``rental_id`` is the user's latest rental, if any.
+        """
+        if username in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(username)
+            return self._entries[username]
+
+        self.misses += 1
+        generation = self._generation
+        keys = await self.db.fetchone(
+            """SELECT u.user_id, (
+                SELECT MAX(rental_id) FROM rentals WHERE user_id = u.user_id
+            )
+            FROM users u WHERE u.linux_username = ?""",
+            (username,),
+        )
+        if keys is not None and generation == self._generation:
+            self._entries[username] = keys
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return keys
+
+    async def user_id(self, username):
+        keys = await self.get(username)
+        return keys[0] if keys else None
+
+    def invalidate(self, username=None):
+        """
+        Forget one username, or every entry when called without one.
+        """
+        self._generation += 1
+        if username is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(username, None)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups * 100 if lookups else 0
+        return (
+            f"{len(self)}/{self.maxsize} entries, {self.hits} hits, "
+            f"{self.misses} misses ({hit_rate:.1f}% hit rate)"
+        )